@@ -0,0 +1,199 @@
+"""
+This file contains the OLAPEngine class. It keeps the SteamDB star schema in memory as NumPy columns
+and answers common rollups without a round trip to MySQL.
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+# Fact columns loaded into memory; measures on any other column fall back to SQL
+ENGINE_MEASURES = ['estimatedRevenue', 'price', 'averagePlaytimeForever', 'medianPlaytimeForever',
+                   'peakCCU', 'positive', 'negative', 'recommendations']
+
+# Dimensions the engine can group or filter by, with the output column(s) each one produces
+ENGINE_DIMENSIONS = {
+    'company': ['developer', 'publisher'],
+    'os': ['osID'],
+    'year': ['releaseYear'],
+    'genre': ['genre'],
+    'tag': ['tag'],
+    'category': ['category'],
+}
+BRIDGE_DIMENSIONS = ['genre', 'tag', 'category']
+
+
+class UnsupportedOLAPQuery(ValueError):
+    """
+    Raised when a rollup needs a dimension, aggregate or measure the engine does not cover;
+    SteamDB.olap_query() answers it with SQL instead.
+    """
+
+
+class OLAPEngine:
+    def __init__(self, engine):
+        self.engine = engine
+        self.row_count = 0
+        self.measures = {}   # measure column -> float64 array, one value per fact row
+        self.codes = {}      # plain dimension -> int array of dictionary codes, one per fact row
+        self.labels = {}     # dimension -> DataFrame of label columns, indexed by code
+        self.bridges = {}    # bridge dimension -> (fact row array, code array)
+        self.load_seconds = None
+
+    def load(self):
+        """
+            Read the fact table and its dimensions once and dictionary-encode every grouping column.
+            Code 0 of each dimension is reserved for NULL / unmatched keys.
+        """
+        start = time.perf_counter()
+        with self.engine.connect() as connection:
+            fact_df = pd.read_sql(text(
+                f"SELECT f.gameID, f.companyID, f.osID, YEAR(g.releaseDate) AS releaseYear, "
+                f"{', '.join('f.' + column for column in ENGINE_MEASURES)} "
+                f"FROM fact_gamemetrics f LEFT JOIN dim_game g ON g.gameID = f.gameID"), connection)
+            company_df = pd.read_sql(text("SELECT companyID, developer, publisher FROM dim_company"), connection)
+            bridge_dfs = {
+                dim_name: pd.read_sql(text(
+                    f"SELECT b.gameID, d.{dim_name} FROM bridge_game_{dim_name} b "
+                    f"JOIN dim_{dim_name} d ON d.{dim_name}ID = b.{dim_name}ID"), connection)
+                for dim_name in BRIDGE_DIMENSIONS
+            }
+
+        self.row_count = len(fact_df)
+        self.measures = {column: pd.to_numeric(fact_df[column], errors='coerce').to_numpy(dtype='float64')
+                         for column in ENGINE_MEASURES}
+
+        # Company: encode companyID, labels come from dim_company
+        codes, uniques = pd.factorize(fact_df['companyID'])
+        self.codes['company'] = codes + 1
+        company_labels = company_df.set_index('companyID').reindex(uniques)[['developer', 'publisher']]
+        self.labels['company'] = self.with_null_label(company_labels.reset_index(drop=True))
+
+        fact_df['releaseYear'] = fact_df['releaseYear'].astype('Int64')
+        for dim_name, column in [('os', 'osID'), ('year', 'releaseYear')]:
+            codes, uniques = pd.factorize(fact_df[column], sort=True)
+            self.codes[dim_name] = codes + 1
+            self.labels[dim_name] = self.with_null_label(pd.DataFrame({column: uniques}))
+
+        # Bridges: one (fact row, code) pair per game/value, so a game with several genres counts once per genre
+        fact_rows = pd.DataFrame({'gameID': fact_df['gameID'], 'row': np.arange(self.row_count)})
+        for dim_name, bridge_df in bridge_dfs.items():
+            pairs = bridge_df.merge(fact_rows, on='gameID', how='inner')
+            codes, uniques = pd.factorize(pairs[dim_name], sort=True)
+            self.bridges[dim_name] = (pairs['row'].to_numpy(), codes + 1)
+            self.labels[dim_name] = self.with_null_label(pd.DataFrame({dim_name: uniques}))
+
+        self.load_seconds = time.perf_counter() - start
+        print(f"OLAP engine loaded {self.row_count} fact rows in {self.load_seconds:.2f}s.")
+
+    @staticmethod
+    def with_null_label(labels: pd.DataFrame):
+        null_row = pd.DataFrame({column: [None] for column in labels.columns})
+        return pd.concat([null_row, labels], ignore_index=True).astype(object)
+
+    def find_dimension(self, column):
+        for dim_name, columns in ENGINE_DIMENSIONS.items():
+            if column in columns or column == dim_name:
+                return dim_name
+        raise UnsupportedOLAPQuery(f"OLAP engine cannot group or filter by '{column}'")
+
+    def matching_codes(self, dim_name, column, value):
+        labels = self.labels[dim_name]
+        column = column if column in labels.columns else labels.columns[0]
+        return np.flatnonzero(labels[column].to_numpy() == value)
+
+    def query(self, group_by, measures, filters=None, order_by=None, limit=None):
+        """
+            Vectorized group-by over the in-memory star schema.
+
+            Args:
+                group_by (list): Dimensions to group by: 'company', 'os', 'year', 'genre', 'tag', 'category'.
+                measures (dict): Output name -> (aggregate, fact column), aggregate in 'sum', 'avg', 'min', 'max', 'count'.
+                filters (dict): Equality filters on dimension labels, e.g. {'tag': 'Battle Royale'}.
+                order_by (str): e.g. 'totalRevenue DESC'.
+                limit (int): Keep the top-N rows after ordering.
+            Raises UnsupportedOLAPQuery for anything the engine does not cover.
+        """
+        filters = filters or {}
+        group_dims = list(dict.fromkeys(self.find_dimension(column) for column in group_by))
+        bridge_groups = [dim_name for dim_name in group_dims if dim_name in BRIDGE_DIMENSIONS]
+        if len(bridge_groups) > 1:
+            raise UnsupportedOLAPQuery("OLAP engine groups by at most one genre/tag/category dimension")
+        for aggregate, column in measures.values():
+            if aggregate not in ('sum', 'avg', 'min', 'max', 'count'):
+                raise UnsupportedOLAPQuery(f"Unsupported aggregate '{aggregate}'")
+            if aggregate != 'count' and column not in self.measures:
+                raise UnsupportedOLAPQuery(f"Fact column '{column}' is not loaded in the OLAP engine")
+
+        # Row mask from filters; bridge filters keep every fact row that has the value at least once
+        mask = np.ones(self.row_count, dtype=bool)
+        for column, value in filters.items():
+            dim_name = self.find_dimension(column)
+            wanted = self.matching_codes(dim_name, column, value)
+            if dim_name in BRIDGE_DIMENSIONS:
+                rows, codes = self.bridges[dim_name]
+                row_mask = np.zeros(self.row_count, dtype=bool)
+                row_mask[rows[np.isin(codes, wanted)]] = True
+                mask &= row_mask
+            else:
+                mask &= np.isin(self.codes[dim_name], wanted)
+
+        # Rows to aggregate: fact rows, or (fact row, value) pairs when grouping by a bridge dimension
+        if bridge_groups:
+            rows, bridge_codes = self.bridges[bridge_groups[0]]
+            keep = mask[rows]
+            rows, bridge_codes = rows[keep], bridge_codes[keep]
+        else:
+            rows = np.flatnonzero(mask)
+            bridge_codes = None
+
+        # Combine per-dimension codes into one integer group key
+        group_key = np.zeros(len(rows), dtype=np.int64)
+        cardinalities = []
+        for dim_name in group_dims:
+            dim_codes = bridge_codes if dim_name in BRIDGE_DIMENSIONS else self.codes[dim_name][rows]
+            cardinality = len(self.labels[dim_name])
+            group_key = group_key * cardinality + dim_codes
+            cardinalities.append(cardinality)
+        present, group_index = np.unique(group_key, return_inverse=True)
+        group_count = len(present)
+
+        # Decode the combined key back into per-dimension codes and look up their labels
+        label_columns = []
+        remaining = present.copy()
+        for dim_name, cardinality in reversed(list(zip(group_dims, cardinalities))):
+            dim_codes = remaining % cardinality
+            remaining //= cardinality
+            label_columns.insert(0, [(column, values.to_numpy()[dim_codes])
+                                     for column, values in self.labels[dim_name].items()])
+        result = {column: values for columns in label_columns for column, values in columns}
+
+        row_counts = np.bincount(group_index, minlength=group_count)
+        for out_name, (aggregate, column) in measures.items():
+            if aggregate == 'count':
+                result[out_name] = row_counts
+                continue
+            values = self.measures[column][rows]
+            valid = ~np.isnan(values)
+            if aggregate in ('sum', 'avg'):
+                sums = np.bincount(group_index, weights=np.where(valid, values, 0.0), minlength=group_count)
+                counts = np.bincount(group_index, weights=valid, minlength=group_count)
+                if aggregate == 'sum':
+                    result[out_name] = np.where(counts > 0, sums, np.nan)
+                else:
+                    with np.errstate(invalid='ignore', divide='ignore'):
+                        result[out_name] = sums / counts
+            else:
+                ufunc, fill = (np.minimum, np.inf) if aggregate == 'min' else (np.maximum, -np.inf)
+                extremes = np.full(group_count, fill)
+                ufunc.at(extremes, group_index[valid], values[valid])
+                result[out_name] = np.where(np.isinf(extremes), np.nan, extremes)
+
+        res_df = pd.DataFrame(result)
+        if order_by:
+            column, _, direction = order_by.partition(' ')
+            res_df = res_df.sort_values(column, ascending=direction.strip().upper() != 'DESC', kind='stable')
+        if limit:
+            res_df = res_df.head(int(limit))
+        return res_df.reset_index(drop=True)
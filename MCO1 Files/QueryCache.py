@@ -0,0 +1,158 @@
+"""
+This file contains the QueryCache class. SteamDB uses it to keep OLAP query results between calls to execute_sql().
+"""
+
+import os
+import re
+import json
+import hashlib
+from collections import OrderedDict
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = feather = None
+
+
+class QueryCache:
+    def __init__(self, max_bytes=256 * 1024 * 1024, spill_dir="queries/cache", max_disk_bytes=1024 * 1024 * 1024):
+        """
+            Two-tier result cache: an in-memory LRU bounded by `max_bytes`, and an on-disk
+            Arrow/Feather tier (requires pyarrow) bounded by `max_disk_bytes`, so entries evicted
+            from memory and results from earlier notebook sessions can still be served.
+        """
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()  # key -> {'df': DataFrame, 'bytes': int, 'output_file': str or None}
+        self.current_bytes = 0
+        self.data_version = None
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'spills': 0,
+                      'disk_evictions': 0, 'disk_errors': 0}
+
+    @staticmethod
+    def is_cacheable(sql_query):
+        return re.match(r'^\s*(SELECT|WITH)\b', sql_query, re.IGNORECASE) is not None
+
+    @staticmethod
+    def normalize(sql_query):
+        # Collapse whitespace and drop a trailing semicolon so formatting differences share an entry
+        return re.sub(r'\s+', ' ', sql_query).strip().rstrip(';').strip()
+
+    def make_key(self, sql_query, params=None):
+        payload = json.dumps([self.normalize(sql_query), params or {}], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def set_data_version(self, data_version):
+        """
+            Drop every entry built against an older warehouse version, in memory and on disk.
+        """
+        if data_version == self.data_version:
+            return
+        self.data_version = data_version
+        self.entries.clear()
+        self.current_bytes = 0
+
+        if os.path.isdir(self.spill_dir):
+            for file_name in os.listdir(self.spill_dir):
+                if not file_name.startswith(f"{data_version}_"):
+                    os.remove(os.path.join(self.spill_dir, file_name))
+
+    def get_spill_path(self, key):
+        return os.path.join(self.spill_dir, f"{self.data_version}_{key}.arrow")
+
+    def get(self, key):
+        """
+            Return the cached entry for `key`, or None. Disk hits are promoted back into memory.
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.stats['memory_hits'] += 1
+            return entry
+
+        spill_path = self.get_spill_path(key)
+        if feather is not None and os.path.exists(spill_path):
+            # A truncated or corrupt spill file is a miss; drop it so the next put() rewrites it
+            try:
+                table = feather.read_table(spill_path, memory_map=True)
+                output_file = (table.schema.metadata or {}).get(b'output_file', b'').decode() or None
+                df = table.to_pandas()
+            except Exception as e:
+                print(f"Ignoring unreadable cached result {spill_path}: {e}")
+                self.stats['disk_errors'] += 1
+                self.remove_spill_file(spill_path)
+            else:
+                os.utime(spill_path)  # most recently used, for prune_spill_dir()
+                self.stats['disk_hits'] += 1
+                return self.put(key, df, output_file, persist=False)
+
+        self.stats['misses'] += 1
+        return None
+
+    def put(self, key, df, output_file=None, persist=True):
+        entry = {'df': df, 'bytes': int(df.memory_usage(deep=True).sum()), 'output_file': output_file}
+        if key in self.entries:
+            self.current_bytes -= self.entries.pop(key)['bytes']
+        self.entries[key] = entry
+        self.current_bytes += entry['bytes']
+        if persist:
+            self.spill(key, entry)
+
+        # Evict least recently used entries (never the one just added) until we are within budget;
+        # evicted results remain available from the disk tier
+        while self.current_bytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.current_bytes -= evicted['bytes']
+            self.stats['evictions'] += 1
+        return entry
+
+    def spill(self, key, entry):
+        if feather is None:
+            return
+        spill_path = self.get_spill_path(key)
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            table = pa.Table.from_pandas(entry['df'], preserve_index=False)
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                                   b'output_file': (entry['output_file'] or '').encode()})
+            feather.write_feather(table, spill_path, compression='uncompressed')
+            self.stats['spills'] += 1
+            self.prune_spill_dir()
+        except Exception as e:
+            print(f"Failed to spill cached result to disk: {e}")
+
+    def remove_spill_file(self, spill_path):
+        try:
+            os.remove(spill_path)
+        except OSError:
+            pass
+
+    def prune_spill_dir(self):
+        """
+            Delete the least recently used spill files until the disk tier fits in `max_disk_bytes`.
+        """
+        files = []
+        for file_name in os.listdir(self.spill_dir):
+            path = os.path.join(self.spill_dir, file_name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total_bytes <= self.max_disk_bytes:
+                break
+            self.remove_spill_file(path)
+            total_bytes -= size
+            self.stats['disk_evictions'] += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.current_bytes = 0
+        if os.path.isdir(self.spill_dir):
+            for file_name in os.listdir(self.spill_dir):
+                os.remove(os.path.join(self.spill_dir, file_name))
@@ -3,17 +3,83 @@ This file contains the SteamDB class. It will setup the data warehouse schema on
 """
 
 import os
+import json
+import time
+import csv
+import uuid
+import hashlib
 import pandas as pd
-from sqlalchemy import create_engine, update, select, text, Table, MetaData
+from sqlalchemy import create_engine, update, select, text, bindparam, Table, MetaData
 from mysql.connector import Error
 from datetime import datetime
+from QueryCache import QueryCache
+from OLAPEngine import OLAPEngine, UnsupportedOLAPQuery, BRIDGE_DIMENSIONS
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+# Summary tables maintained by SteamDB.build_aggregates(). Each one groups the fact table by `keys`
+# (column alias -> SQL expression). `bridge` names a key that comes from a many-to-many bridge table:
+# such an aggregate counts a game once per genre/tag, so it can only answer rollups that keep that key.
+AGG_JOIN_GAME = "JOIN dim_game g ON g.gameID = f.gameID"
+AGGREGATES = {
+    'agg_company': {'keys': {'companyID': 'f.companyID'}, 'joins': ''},
+    'agg_os': {'keys': {'osID': 'f.osID'}, 'joins': ''},
+    'agg_year': {'keys': {'releaseYear': 'YEAR(g.releaseDate)'}, 'joins': AGG_JOIN_GAME},
+    'agg_os_year': {'keys': {'osID': 'f.osID', 'releaseYear': 'YEAR(g.releaseDate)'}, 'joins': AGG_JOIN_GAME},
+    'agg_genre_year': {'keys': {'genreID': 'bg.genreID', 'releaseYear': 'YEAR(g.releaseDate)'},
+                       'joins': f"{AGG_JOIN_GAME} JOIN bridge_game_genre bg ON bg.gameID = f.gameID",
+                       'bridge': 'genreID'},
+    'agg_tag_year': {'keys': {'tagID': 'bt.tagID', 'releaseYear': 'YEAR(g.releaseDate)'},
+                     'joins': f"{AGG_JOIN_GAME} JOIN bridge_game_tag bt ON bt.gameID = f.gameID",
+                     'bridge': 'tagID'},
+}
+
+# Additive measures stored in every summary table; averages are derived as sum / count when rolling up
+AGG_MEASURES = {
+    'gameCount': 'COUNT(*)',
+    'totalRevenue': 'SUM(f.estimatedRevenue)',
+    'sumPlaytime': 'SUM(f.averagePlaytimeForever)',
+    'playtimeCount': 'COUNT(f.averagePlaytimeForever)',
+}
+
+# SQL equivalents of the OLAPEngine dimensions, used when olap_query() falls back to MySQL:
+# dimension -> (select expressions, join clause)
+OLAP_SQL_DIMENSIONS = {
+    'company': (['c.developer', 'c.publisher'], "LEFT JOIN dim_company c ON c.companyID = f.companyID"),
+    'os': (['f.osID'], ""),
+    'year': (['YEAR(g.releaseDate) AS releaseYear'], "LEFT JOIN dim_game g ON g.gameID = f.gameID"),
+    'genre': (['d_genre.genre'], "JOIN bridge_game_genre b_genre ON b_genre.gameID = f.gameID "
+                                 "JOIN dim_genre d_genre ON d_genre.genreID = b_genre.genreID"),
+    'tag': (['d_tag.tag'], "JOIN bridge_game_tag b_tag ON b_tag.gameID = f.gameID "
+                           "JOIN dim_tag d_tag ON d_tag.tagID = b_tag.tagID"),
+    'category': (['d_category.category'], "JOIN bridge_game_category b_category ON b_category.gameID = f.gameID "
+                                          "JOIN dim_category d_category ON d_category.categoryID = b_category.categoryID"),
+}
+
+# Descriptive columns that rollup() can join onto a key, and filter by
+AGG_LABELS = {
+    'companyID': ('dim_company', ['developer', 'publisher']),
+    'genreID': ('dim_genre', ['genre']),
+    'tagID': ('dim_tag', ['tag']),
+}
 
 
 class SteamDB:
-    def __init__(self, db_config, csv_file="data/games_fixed.csv", connect_only=False):
+    def __init__(self, db_config, csv_file="data/games_fixed.csv", connect_only=False, use_cache=True,
+                 result_cache_bytes=256 * 1024 * 1024):
         self.csv_file = csv_file
         self.db_config = db_config
         self.df = None
+        self.use_cache = use_cache
+        self.cache_dir = '.cache'
+        self.load_stats = {}
+        self.aggregate_rows = {}
+        self.olap_engine = None
+        self.olap_engine_version = None
+        self.result_cache = QueryCache(max_bytes=result_cache_bytes) if use_cache else None
         self.engine = None
         self.metadata = None
         
@@ -25,38 +91,136 @@ class SteamDB:
             self.engine = create_engine(f"mysql+mysqlconnector://{self.db_config['user']}:{self.db_config['password']}@{self.db_config['host']}:{self.db_config['port']}/{self.db_config['database']}")
 
     def load_csv(self):
-        # Load CSV into a DataFrame
+        # Load CSV into a DataFrame, reusing the columnar cache when the source file is unchanged
+        start = time.perf_counter()
         try:
-            self.df = pd.read_csv(self.csv_file)
+            source_key = self.get_source_key() if self.cache_enabled() else None
+            self.df = self.read_csv_cache(source_key)
+            if self.df is not None:
+                self.load_stats = {'cache': 'HIT', 'seconds': time.perf_counter() - start}
+                print(f"CSV loaded from cache in {self.load_stats['seconds']:.2f}s (cache hit).")
+                return
 
-            # Change the column names to match the database columns
-            new_column_names = [
-                'gameID', 'name', 'releaseDate', 'estimatedOwners',
-                'peakCCU', 'requiredAge', 'price', 'dlcCount',
-                'aboutTheGame', 'supportedLanguages', 'fullAudioLanguages',
-                'reviews', 'headerImageHREF', 'websiteURL', 'supportURL',
-                'supportEmail', 'windowsSupport', 'macSupport', 'linuxSupport',
-                'metacriticScore', 'NewMetacriticUrl', 'userScore',
-                'positive', 'negative', 'scoreRank', 'achievementCount',
-                'recommendations', 'NewNotes', 'averagePlaytimeForever',
-                'averagePlaytimeTwoWeeks', 'medianPlaytimeForever',
-                'medianPlaytimeTwoWeeks', 'developer', 'publisher',
-                'categories', 'genres', 'tags', 'NewScreenshots',
-                'NewMovies'
-            ]
-            rename_mapping = dict(zip(self.df.columns, new_column_names))
-            self.df.rename(columns=rename_mapping, inplace=True)
-            
-            # Remove rows with NULL gameID
-            self.df = self.df[ self.df['gameID'].notnull() ]
-
-            # Change format from "MMMM DD, YYYY" to MM-DD-YYYY for a DATE type
-            self.df['releaseDate'] = pd.to_datetime(self.df['releaseDate'], format='mixed', dayfirst=True).dt.strftime('%Y-%m-%d')
+            self.df = pd.read_csv(self.csv_file)
+            self.clean_csv()
+            self.write_csv_cache(source_key)
 
-            print("CSV loaded into DataFrame.")
+            self.load_stats = {'cache': 'MISS', 'seconds': time.perf_counter() - start}
+            print(f"CSV loaded into DataFrame in {self.load_stats['seconds']:.2f}s (cache miss).")
         except Error as e:
             print(f"Failed to load CSV: {e}")
 
+    def clean_csv(self):
+        # Change the column names to match the database columns
+        new_column_names = [
+            'gameID', 'name', 'releaseDate', 'estimatedOwners',
+            'peakCCU', 'requiredAge', 'price', 'dlcCount',
+            'aboutTheGame', 'supportedLanguages', 'fullAudioLanguages',
+            'reviews', 'headerImageHREF', 'websiteURL', 'supportURL',
+            'supportEmail', 'windowsSupport', 'macSupport', 'linuxSupport',
+            'metacriticScore', 'NewMetacriticUrl', 'userScore',
+            'positive', 'negative', 'scoreRank', 'achievementCount',
+            'recommendations', 'NewNotes', 'averagePlaytimeForever',
+            'averagePlaytimeTwoWeeks', 'medianPlaytimeForever',
+            'medianPlaytimeTwoWeeks', 'developer', 'publisher',
+            'categories', 'genres', 'tags', 'NewScreenshots',
+            'NewMovies'
+        ]
+        rename_mapping = dict(zip(self.df.columns, new_column_names))
+        self.df.rename(columns=rename_mapping, inplace=True)
+        
+        # Remove rows with NULL gameID (reset the index so cached and freshly parsed frames line up)
+        self.df = self.df[ self.df['gameID'].notnull() ].reset_index(drop=True)
+
+        # Change format from "MMMM DD, YYYY" to MM-DD-YYYY for a DATE type
+        self.df['releaseDate'] = pd.to_datetime(self.df['releaseDate'], format='mixed', dayfirst=True).dt.strftime('%Y-%m-%d')
+
+    ### COLUMNAR CSV CACHE ###
+
+    def cache_enabled(self):
+        if self.use_cache and feather is None:
+            print("pyarrow is not installed; the columnar CSV cache is disabled.")
+            self.use_cache = False
+        return self.use_cache
+
+    def get_source_key(self):
+        """
+            Identify the current version of the source CSV by its size, mtime, and content hash.
+            The hash is only recomputed when size or mtime differ from the cached metadata.
+        """
+        stat = os.stat(self.csv_file)
+        source_key = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': None}
+
+        cached_key = self.read_cache_meta()
+        if (cached_key and cached_key.get('sha256') and cached_key.get('size') == source_key['size']
+                and cached_key.get('mtime') == source_key['mtime']):
+            source_key['sha256'] = cached_key.get('sha256')
+            return source_key
+
+        sha = hashlib.sha256()
+        with open(self.csv_file, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                sha.update(block)
+        source_key['sha256'] = sha.hexdigest()
+        return source_key
+
+    def get_cache_paths(self):
+        base_name = os.path.splitext(os.path.basename(self.csv_file))[0]
+        cache_dir = os.path.join(os.path.dirname(self.csv_file), self.cache_dir)
+        return (os.path.join(cache_dir, f"{base_name}.arrow"),
+                os.path.join(cache_dir, f"{base_name}.meta.json"))
+
+    def read_cache_meta(self):
+        _, meta_path = self.get_cache_paths()
+        try:
+            with open(meta_path, 'r') as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def read_csv_cache(self, source_key):
+        """
+            Return the cleaned DataFrame from the Arrow IPC cache (memory-mapped), or None on a miss.
+        """
+        if source_key is None:
+            return None
+
+        cache_path, meta_path = self.get_cache_paths()
+        cached_key = self.read_cache_meta()
+        if not cached_key or cached_key.get('sha256') != source_key['sha256'] or not os.path.exists(cache_path):
+            return None
+
+        # A truncated or corrupt cache file is a miss; load_csv parses the CSV and rewrites the cache
+        try:
+            df = feather.read_table(cache_path, memory_map=True).to_pandas()
+        except Exception as e:
+            print(f"Ignoring unreadable CSV cache {cache_path}: {e}")
+            return None
+
+        # Same content under a new mtime (e.g. the file was touched): refresh the metadata so the fast path hits next time
+        if cached_key.get('mtime') != source_key['mtime'] or cached_key.get('size') != source_key['size']:
+            try:
+                with open(meta_path, 'w') as file:
+                    json.dump(source_key, file)
+            except OSError as e:
+                print(f"Failed to update CSV cache metadata: {e}")
+
+        return df
+
+    def write_csv_cache(self, source_key):
+        if source_key is None:
+            return
+
+        cache_path, meta_path = self.get_cache_paths()
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            # Uncompressed Feather v2 (Arrow IPC) so the cache can be memory-mapped on the next load
+            feather.write_feather(self.df, cache_path, compression='uncompressed')
+            with open(meta_path, 'w') as file:
+                json.dump(source_key, file)
+        except Exception as e:
+            print(f"Failed to write CSV cache: {e}")
+
     def create_connection(self):
         # Create a connection to the MySQL server
         connection_string = f"mysql+mysqlconnector://{self.db_config['user']}:{self.db_config['password']}@{self.db_config['host']}:{self.db_config['port']}"
@@ -106,6 +270,12 @@ class SteamDB:
             dim_game_df = dim_game_df.drop_duplicates(subset=['gameID', 'name']) 
             self.insert_to_mysql(dim_game_df[dim_game_attr], "dim_game")
             
+            curr_action = "genre/tag/category bridges"
+            for column, dim_name in [('genres', 'genre'), ('tags', 'tag'), ('categories', 'category')]:
+                dim_df, bridge_df = self.explode_multivalue(dim_game_df, column, dim_name)
+                self.insert_to_mysql(dim_df, f"dim_{dim_name}")
+                self.insert_to_mysql(bridge_df, f"bridge_game_{dim_name}")
+            
             curr_action = "dim_company" # 59,807 rows
             dim_company_attr = ['developer', 'publisher']
             dim_company_df = self.df[dim_company_attr]
@@ -124,6 +294,11 @@ class SteamDB:
             ]
             fact_df = fact_df[fact_attr]
             
+            curr_action = "fact table owner ranges"
+            owners_df = self.parse_owner_range(fact_df['estimatedOwners'])
+            fact_df = pd.concat([fact_df, owners_df], axis=1)
+            fact_df['estimatedRevenue'] = fact_df['price'] * fact_df['ownersMid']
+            
             curr_action = "fact table companyID"
             company_id_df = self.get_company_id(dim_company_df, fact_df['gameID'])
             fact_df = pd.merge(fact_df, company_id_df, on=['gameID'], how='left')
@@ -134,9 +309,42 @@ class SteamDB:
                                                                            row['linuxSupport']), axis=1)
             self.insert_to_mysql(fact_df, "fact_gamemetrics")
             
+            curr_action = "aggregate tables"
+            self.build_aggregates()
+            self.bump_data_version()
+            
         except Error as e:
             print(f"Failed to populate '{curr_action}': {e}")
             
+    def explode_multivalue(self, game_df: pd.DataFrame, column, dim_name):
+        """
+            Split a comma-separated column (e.g. `genres`) into a dimension of distinct values
+            and a gameID-to-value bridge, both keyed by integer IDs.
+        """
+        id_column = f"{dim_name}ID"
+        values = game_df[['gameID', column]].dropna()
+        values = values.assign(**{dim_name: values[column].str.split(',')}).explode(dim_name)
+        values[dim_name] = values[dim_name].str.strip()
+        values = values[values[dim_name] != ''].drop_duplicates(subset=['gameID', dim_name])
+
+        codes, uniques = pd.factorize(values[dim_name], sort=True)
+        dim_df = pd.DataFrame({id_column: range(1, len(uniques) + 1), dim_name: uniques})
+        bridge_df = pd.DataFrame({'gameID': values['gameID'].to_numpy(), id_column: codes + 1})
+        return dim_df, bridge_df
+
+    def parse_owner_range(self, owners: pd.Series):
+        """
+            Parse range strings such as "0 - 20000" into integer lower/upper/midpoint columns.
+            Values that are not a range become NULL.
+        """
+        bounds = owners.astype('string').str.extract(r'^\s*(\d+)\s*-\s*(\d+)\s*$')
+        owners_df = pd.DataFrame({
+            'ownersLow': pd.to_numeric(bounds[0]).astype('Int64'),
+            'ownersHigh': pd.to_numeric(bounds[1]).astype('Int64'),
+        }, index=owners.index)
+        owners_df['ownersMid'] = (owners_df['ownersLow'] + owners_df['ownersHigh']) // 2
+        return owners_df
+
     def get_company_id(self, company_df: pd.DataFrame, game_ids: pd.Series):
         result = self.df[self.df['gameID'].isin(game_ids)][['gameID', 'developer', 'publisher']]
         merged_result = pd.merge(result, 
@@ -151,23 +359,104 @@ class SteamDB:
         linux_bit = 1 if linux else 0
         return f"{windows_bit}{mac_bit}{linux_bit}"
 
-    def execute_sql(self, sql_query, with_results = False):
+    def execute_sql(self, sql_query, with_results = False, params=None, write_output=True):
+        # Serve repeated analytical queries from the result cache while the warehouse data is unchanged
+        cache_key = None
+        data_version = self.get_data_version() if self.result_cache is not None and QueryCache.is_cacheable(sql_query) else None
+        if data_version is not None:
+            self.result_cache.set_data_version(data_version)
+            cache_key = self.result_cache.make_key(sql_query, params)
+            entry = self.result_cache.get(cache_key)
+            if entry is not None:
+                if with_results:
+                    if write_output and (entry['output_file'] is None or not os.path.exists(entry['output_file'])):
+                        entry['output_file'] = self.write_query_output(entry['df'])
+                    return entry['df'].copy()
+                print(entry['df'])
+                return
+
         with self.engine.connect() as connection:
-            result = connection.execute(text(sql_query))
+            result = connection.execute(text(sql_query), params or {})
             res_df = pd.DataFrame(result.fetchall(), columns=result.keys())
-            if with_results:
-                output_dir = 'queries/output'
-                if not os.path.exists(output_dir):
-                    os.makedirs(output_dir)
-                
-                # Generate a filename based on the query or timestamp
-                current_time = datetime.now().strftime("%Y%m%d_%H%M%S") 
-                output_file = os.path.join(output_dir, f'query_output_{current_time}.csv')
-                
-                res_df.to_csv(output_file, index=False)
-                return res_df
-            else:
-                print(res_df)
+
+        output_file = self.write_query_output(res_df) if with_results and write_output else None
+        if cache_key is not None:
+            self.result_cache.put(cache_key, res_df, output_file)
+        if with_results:
+            return res_df.copy() if cache_key is not None else res_df
+        print(res_df)
+
+    def write_query_output(self, res_df: pd.DataFrame):
+        output_dir = 'queries/output'
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        
+        # Generate a filename based on the query or timestamp
+        current_time = datetime.now().strftime("%Y%m%d_%H%M%S") 
+        output_file = os.path.join(output_dir, f'query_output_{current_time}.csv')
+        
+        res_df.to_csv(output_file, index=False)
+        return output_file
+
+    def export_sql(self, sql_query, output_file=None, params=None, chunksize=50000):
+        """
+            Stream a (large) query result straight to a CSV file in chunks, without building a DataFrame.
+            Returns the output file path and the number of rows written.
+        """
+        if output_file is None:
+            output_dir = 'queries/output'
+            os.makedirs(output_dir, exist_ok=True)
+            current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_file = os.path.join(output_dir, f'query_export_{current_time}.csv')
+
+        # The mysqlconnector dialect ignores stream_results and buffers the whole result, so use an
+        # unbuffered driver cursor: rows come from the server as fetchmany() asks for them
+        compiled = text(sql_query).compile(dialect=self.engine.dialect)
+        bound = compiled.construct_params(params or {})
+        # Positional dialects (format) take a tuple; pyformat takes the named parameters as a dict
+        args = tuple(bound[name] for name in compiled.positiontup) if compiled.positiontup else bound
+
+        rows_written = 0
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor(buffered=False)
+            cursor.execute(str(compiled), args)
+            with open(output_file, 'w', newline='', encoding='utf-8') as file:
+                writer = csv.writer(file)
+                writer.writerow(column[0] for column in cursor.description)
+                while True:
+                    chunk = cursor.fetchmany(chunksize)
+                    if not chunk:
+                        break
+                    writer.writerows(chunk)
+                    rows_written += len(chunk)
+            cursor.close()
+        finally:
+            connection.close()
+        print(f"Exported {rows_written} rows to {output_file}.")
+        return output_file, rows_written
+
+    ### WAREHOUSE DATA VERSION ###
+
+    def get_data_version(self):
+        # None (no caching) when the warehouse was built without `warehouse_meta`
+        try:
+            with self.engine.connect() as connection:
+                return connection.execute(text("SELECT dataVersion FROM warehouse_meta WHERE metaID = 1")).scalar()
+        except Exception:
+            return None
+
+    def bump_data_version(self):
+        """
+            Mark the warehouse contents as changed; cached query results from older versions are dropped.
+        """
+        data_version = uuid.uuid4().hex
+        with self.engine.begin() as connection:
+            connection.execute(text("UPDATE warehouse_meta SET dataVersion = :version WHERE metaID = 1"),
+                               {'version': data_version})
+        if self.result_cache is not None:
+            self.result_cache.set_data_version(data_version)
+        return data_version
 
     def insert_to_mysql(self, df: pd.DataFrame, table_name):
         with self.engine.connect() as connection:
@@ -190,6 +479,295 @@ class SteamDB:
                 transaction.rollback()  # Rollback the transaction on error
                 print("Transaction rolled back.")
 
+    ### OLAP AGGREGATE TABLES ###
+
+    def get_aggregate_select(self, agg_name, key_filter=''):
+        agg = AGGREGATES[agg_name]
+        columns = [f"{expr} AS {key}" for key, expr in agg['keys'].items()]
+        columns += [f"{expr} AS {measure}" for measure, expr in AGG_MEASURES.items()]
+        group_by = ', '.join(agg['keys'].values())
+        return f"SELECT {', '.join(columns)} FROM fact_gamemetrics f {agg['joins']} {key_filter} GROUP BY {group_by}"
+
+    def build_aggregates(self):
+        """
+            (Re)build every summary table in AGGREGATES from the fact table.
+        """
+        self.aggregate_rows = {}
+        self.olap_engine = None
+        with self.engine.begin() as connection:
+            for agg_name, agg in AGGREGATES.items():
+                connection.execute(text(f"DROP TABLE IF EXISTS {agg_name}"))
+                connection.execute(text(f"CREATE TABLE {agg_name} AS {self.get_aggregate_select(agg_name)}"))
+                connection.execute(text(f"CREATE INDEX idx_{agg_name} ON {agg_name} ({', '.join(agg['keys'])})"))
+                self.aggregate_rows[agg_name] = connection.execute(text(f"SELECT COUNT(*) FROM {agg_name}")).scalar()
+        print(f"Aggregate tables built: {self.aggregate_rows}")
+
+    def get_affected_groups(self, connection, agg_name, game_ids):
+        agg = AGGREGATES[agg_name]
+        query = text(f"SELECT DISTINCT {', '.join(f'{expr} AS {key}' for key, expr in agg['keys'].items())} "
+                     f"FROM fact_gamemetrics f {agg['joins']} WHERE f.gameID IN :game_ids").bindparams(
+                         bindparam('game_ids', expanding=True))
+        return {tuple(row) for row in connection.execute(query, {'game_ids': list(game_ids)})}
+
+    def get_group_prefilter(self, agg_name, affected, params):
+        """
+            Range/equality predicates on the key columns themselves that cover every group in `affected`.
+
+            The exact null-safe group match compares expressions such as YEAR(g.releaseDate), which MySQL
+            cannot use an index or range for; ANDing this in first restricts the rows it is evaluated on.
+        """
+        terms = []
+        for j, (key, expr) in enumerate(AGGREGATES[agg_name]['keys'].items()):
+            values = {group[j] for group in affected}
+            # releaseYear = y  ->  releaseDate in [y-01-01, y+1-01-01)
+            column = expr[len('YEAR('):-1] if expr.startswith('YEAR(') else expr
+            options = [f"{column} IS NULL"] if None in values else []
+            for i, value in enumerate(sorted(value for value in values if value is not None)):
+                if column != expr:
+                    params[f"p{j}_{i}_from"], params[f"p{j}_{i}_to"] = f"{int(value)}-01-01", f"{int(value) + 1}-01-01"
+                    options.append(f"({column} >= :p{j}_{i}_from AND {column} < :p{j}_{i}_to)")
+                else:
+                    params[f"p{j}_{i}"] = value
+                    options.append(f"{expr} = :p{j}_{i}")
+            terms.append(f"({' OR '.join(options)})")
+        return ' AND '.join(terms)
+
+    def refresh_aggregates(self, game_ids, groups=None, connection=None):
+        """
+            Recompute only the summary-table groups that contain `game_ids`.
+
+            `groups` holds affected groups collected before the fact rows changed (see apply_fact_change),
+            so that groups a game moved out of, or that became empty, are refreshed too. Runs on `connection`
+            when given, so the refresh commits together with the fact change.
+        """
+        game_ids = list(game_ids)
+        if not game_ids:
+            return
+        if connection is None:
+            with self.engine.begin() as connection:
+                return self.refresh_aggregates(game_ids, groups, connection)
+
+        for agg_name, agg in AGGREGATES.items():
+            affected = self.get_affected_groups(connection, agg_name, game_ids)
+            if groups:
+                affected |= groups.get(agg_name, set())
+            if not affected:
+                continue
+
+            # Null-safe match on every key so groups such as an unknown release year are refreshed too
+            params, table_match, source_match = {}, [], []
+            for i, group in enumerate(affected):
+                table_terms, source_terms = [], []
+                for j, (key, expr) in enumerate(agg['keys'].items()):
+                    params[f"k{i}_{j}"] = group[j]
+                    table_terms.append(f"{key} <=> :k{i}_{j}")
+                    source_terms.append(f"{expr} <=> :k{i}_{j}")
+                table_match.append(f"({' AND '.join(table_terms)})")
+                source_match.append(f"({' AND '.join(source_terms)})")
+            source_filter = f"WHERE {self.get_group_prefilter(agg_name, affected, params)} AND ({' OR '.join(source_match)})"
+
+            columns = ', '.join(list(agg['keys']) + list(AGG_MEASURES))
+            connection.execute(text(f"DELETE FROM {agg_name} WHERE {' OR '.join(table_match)}"), params)
+            connection.execute(text(f"INSERT INTO {agg_name} ({columns}) "
+                                    f"{self.get_aggregate_select(agg_name, source_filter)}"), params)
+        print(f"Aggregate tables refreshed for {len(game_ids)} game(s).")
+
+    def apply_fact_change(self, sql_query, game_ids, params=None):
+        """
+            Run an INSERT/UPDATE/DELETE on fact_gamemetrics that touches `game_ids` and incrementally refresh
+            the affected summary-table groups in the same transaction, so readers never see them disagree.
+        """
+        game_ids = list(game_ids)
+        with self.engine.begin() as connection:
+            groups = {agg_name: self.get_affected_groups(connection, agg_name, game_ids) for agg_name in AGGREGATES}
+            connection.execute(text(sql_query), params or {})
+            self.refresh_aggregates(game_ids, groups, connection)
+        self.bump_data_version()
+
+    def choose_aggregate(self, keys):
+        """
+            Pick the smallest summary table that can answer a rollup over `keys`.
+        """
+        candidates = []
+        for agg_name, agg in AGGREGATES.items():
+            if not set(keys) <= set(agg['keys']):
+                continue
+            if agg.get('bridge') and agg['bridge'] not in keys:
+                continue
+            candidates.append(agg_name)
+        if not candidates:
+            return None
+        if not self.aggregate_rows:
+            # e.g. connect_only=True: size the existing summary tables once
+            with self.engine.connect() as connection:
+                self.aggregate_rows = {name: connection.execute(text(f"SELECT COUNT(*) FROM {name}")).scalar()
+                                       for name in AGGREGATES}
+        return min(candidates, key=lambda agg_name: self.aggregate_rows.get(agg_name, float('inf')))
+
+    def rollup(self, group_by, filters=None, order_by=None, limit=None, with_results=True):
+        """
+            Answer a rollup over the fact table from the smallest matching summary table.
+
+            Args:
+                group_by (list): Keys to group by, e.g. ['companyID'] or ['genreID', 'releaseYear'].
+                filters (dict): Equality filters on keys or their labels, e.g. {'tag': 'Battle Royale'}.
+                order_by (str): ORDER BY clause, e.g. 'totalRevenue DESC'.
+                limit (int): Maximum number of rows.
+            Returns the same as execute_sql(). Label columns (developer, publisher, genre, tag) are joined in.
+        """
+        filters = filters or {}
+        label_owner = {label: key for key, (_, labels) in AGG_LABELS.items() for label in labels}
+        keys = list(group_by) + [label_owner.get(column, column) for column in filters]
+        agg_name = self.choose_aggregate(keys)
+        if agg_name is None:
+            raise ValueError(f"No aggregate table covers {keys}")
+
+        select_columns = [f"a.{key}" for key in group_by]
+        joins, where, params = [], [], {}
+        for key in dict.fromkeys(keys):
+            if key in AGG_LABELS:
+                table, labels = AGG_LABELS[key]
+                joins.append(f"JOIN {table} ON {table}.{key} = a.{key}")
+                if key in group_by:
+                    select_columns += [f"{table}.{label}" for label in labels]
+        for i, (column, value) in enumerate(filters.items()):
+            qualified = f"{AGG_LABELS[label_owner[column]][0]}.{column}" if column in label_owner else f"a.{column}"
+            where.append(f"{qualified} = :f{i}")
+            params[f"f{i}"] = value
+
+        sql_query = (f"SELECT {', '.join(select_columns + ['SUM(a.gameCount) AS gameCount', 'SUM(a.totalRevenue) AS totalRevenue', 'SUM(a.sumPlaytime) / SUM(a.playtimeCount) AS avgPlaytime'])} "
+                     f"FROM {agg_name} a {' '.join(joins)} ")
+        if where:
+            sql_query += f"WHERE {' AND '.join(where)} "
+        if group_by:
+            sql_query += f"GROUP BY {', '.join(select_columns)} "
+        if order_by:
+            sql_query += f"ORDER BY {order_by} "
+        if limit:
+            sql_query += f"LIMIT {int(limit)}"
+        return self.execute_sql(sql_query, with_results=with_results, params=params)
+
+    ### IN-PROCESS OLAP ENGINE ###
+
+    def load_olap_engine(self):
+        """
+            Load the star schema into memory once so olap_query() can answer rollups without MySQL.
+            Call again after the warehouse changes to pick up new data.
+        """
+        self.olap_engine = OLAPEngine(self.engine)
+        self.olap_engine.load()
+        self.olap_engine_version = self.get_data_version()
+        return self.olap_engine
+
+    def refresh_olap_engine(self):
+        # Reload a loaded engine whose snapshot predates the current warehouse data version
+        if self.olap_engine is not None and self.get_data_version() != self.olap_engine_version:
+            print("Warehouse data changed; reloading the OLAP engine.")
+            self.load_olap_engine()
+        return self.olap_engine
+
+    def olap_query(self, group_by, measures, filters=None, order_by=None, limit=None):
+        """
+            Answer a rollup with the in-process OLAP engine when it is loaded and supports the request,
+            otherwise run the equivalent SQL against MySQL. Arguments are the same as OLAPEngine.query().
+        """
+        if self.refresh_olap_engine() is not None:
+            try:
+                return self.olap_engine.query(group_by, measures, filters, order_by, limit)
+            except UnsupportedOLAPQuery as e:
+                print(f"OLAP engine fallback to SQL: {e}")
+        sql_query, params = self.build_olap_sql(group_by, measures, filters, order_by, limit)
+        return self.execute_sql(sql_query, with_results=True, params=params, write_output=False)
+
+    def build_olap_sql(self, group_by, measures, filters=None, order_by=None, limit=None):
+        filters = filters or {}
+
+        def find_dimension(column):
+            for dim_name, (expressions, _) in OLAP_SQL_DIMENSIONS.items():
+                if column == dim_name or any(expr.split('.')[-1].split(' AS ')[-1] == column for expr in expressions):
+                    return dim_name
+            raise ValueError(f"Unknown OLAP dimension '{column}'")
+
+        def label_expression(dim_name, column):
+            for expr in OLAP_SQL_DIMENSIONS[dim_name][0]:
+                if expr.split('.')[-1].split(' AS ')[-1] == column:
+                    return expr.split(' AS ')[0]
+            return OLAP_SQL_DIMENSIONS[dim_name][0][0].split(' AS ')[0]
+
+        group_dims = list(dict.fromkeys(find_dimension(column) for column in group_by))
+        select_columns, group_columns, joins = [], [], []
+        for dim_name in group_dims:
+            expressions, join = OLAP_SQL_DIMENSIONS[dim_name]
+            select_columns += expressions
+            group_columns += [expr.split(' AS ')[0] for expr in expressions]
+            if join and join not in joins:
+                joins.append(join)
+
+        where, params = [], {}
+        for i, (column, value) in enumerate(filters.items()):
+            dim_name = find_dimension(column)
+            params[f"f{i}"] = value
+            if dim_name in BRIDGE_DIMENSIONS and dim_name not in group_dims:
+                # Semi-join so that filtering by a tag does not duplicate fact rows
+                where.append(f"f.gameID IN (SELECT b.gameID FROM bridge_game_{dim_name} b "
+                             f"JOIN dim_{dim_name} d ON d.{dim_name}ID = b.{dim_name}ID WHERE d.{dim_name} = :f{i})")
+                continue
+            join = OLAP_SQL_DIMENSIONS[dim_name][1]
+            if join and join not in joins:
+                joins.append(join)
+            where.append(f"{label_expression(dim_name, column)} = :f{i}")
+
+        for out_name, (aggregate, column) in measures.items():
+            expr = "COUNT(*)" if aggregate == 'count' else f"{aggregate.upper()}(f.{column})"
+            select_columns.append(f"{expr} AS {out_name}")
+
+        sql_query = f"SELECT {', '.join(select_columns)} FROM fact_gamemetrics f {' '.join(joins)} "
+        if where:
+            sql_query += f"WHERE {' AND '.join(where)} "
+        if group_columns:
+            sql_query += f"GROUP BY {', '.join(group_columns)} "
+        if order_by:
+            sql_query += f"ORDER BY {order_by} "
+        if limit:
+            sql_query += f"LIMIT {int(limit)}"
+        return sql_query, params
+
+    def benchmark_olap(self, repeats=5):
+        """
+            Time the standard notebook rollups on the in-process engine and on MySQL.
+            The MySQL side bypasses the result cache. Returns a DataFrame of median milliseconds per query.
+        """
+        if self.refresh_olap_engine() is None:
+            self.load_olap_engine()
+
+        revenue = {'totalRevenue': ('sum', 'estimatedRevenue')}
+        workload = {
+            'revenue by company (top 5)': (['company'], revenue, None, 'totalRevenue DESC', 5),
+            'revenue and playtime by OS': (['os'], {**revenue, 'avgPlaytime': ('avg', 'averagePlaytimeForever')}, None, 'totalRevenue DESC', None),
+            'revenue by genre and year': (['genre', 'year'], revenue, None, None, None),
+            'Battle Royale games by year': (['year'], {'gamesCount': ('count', None)}, {'tag': 'Battle Royale'}, 'releaseYear', None),
+        }
+
+        results = []
+        for name, (group_by, measures, filters, order_by, limit) in workload.items():
+            sql_query, params = self.build_olap_sql(group_by, measures, filters, order_by, limit)
+            timings = {'engine': [], 'mysql': []}
+            for _ in range(repeats):
+                start = time.perf_counter()
+                self.olap_engine.query(group_by, measures, filters, order_by, limit)
+                timings['engine'].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                with self.engine.connect() as connection:
+                    connection.execute(text(sql_query), params).fetchall()
+                timings['mysql'].append(time.perf_counter() - start)
+
+            engine_ms = sorted(timings['engine'])[repeats // 2] * 1000
+            mysql_ms = sorted(timings['mysql'])[repeats // 2] * 1000
+            results.append({'query': name, 'engine_ms': round(engine_ms, 2), 'mysql_ms': round(mysql_ms, 2),
+                            'speedup': round(mysql_ms / engine_ms, 1) if engine_ms else None})
+        return pd.DataFrame(results)
+
     def close(self):
         if self.engine:
             self.engine.dispose()
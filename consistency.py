@@ -0,0 +1,44 @@
+from typing import List
+
+
+class StaleReadError(RuntimeError):
+    """
+    Raised when a node has not applied the commit version a read requires within the wait timeout.
+    """
+
+
+def parse_token(token) -> int:
+    """
+    Consistency tokens are the central node's commit version, passed around as an int or a string.
+    """
+    if token is None or token == '':
+        return 0
+    return int(token)
+
+
+def choose_read_node(preferred, nodes: List, token, wait_timeout: float = 2.0, exclude: List = ()):
+    """
+    Pick the node that serves a read which must observe commit version `token`.
+
+    The preferred node is used if it has applied the version, or catches up within `wait_timeout`
+    seconds. Otherwise the read is redirected to any available replica that has applied it, and as a
+    last resort to the central node, which has applied every version it issued.
+
+    Nodes in `exclude` are never chosen, not even the preferred one: a DatabaseNode runs transactions
+    on a single connection, so a node already serving another transaction of the same request
+    must not get a concurrent one.
+    """
+    version = parse_token(token)
+    if preferred not in exclude and (version == 0 or preferred.wait_for_version(version, wait_timeout)):
+        return preferred
+
+    candidates = [node for node in nodes if node is not preferred and node not in exclude and node.is_available]
+    # Replicas first, so the central node only serves the read when no replica can
+    for node in candidates:
+        if not node.is_central and node.applied_version >= version:
+            return node
+
+    central = next((node for node in candidates if node.is_central), None)
+    if central is not None:
+        return central
+    raise StaleReadError(f'No free node has applied version {version}')
@@ -0,0 +1,217 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple
+
+
+class ScatterGatherExecutor:
+    """
+    Runs a read over steam_games on several DatabaseNodes at once by splitting it into game_id ranges.
+
+    Filters and partial aggregates are pushed down to every node, and the coordinator merges the
+    partial results. Replicas that are unavailable or behind the central node are skipped and their
+    share of the range is read from the remaining nodes; the plan lists them with the reason.
+
+    In primary mode a replica is current when its applied_version is at most `max_version_lag` commits
+    behind the central node's commit_version. In merge mode there are no commit versions, so it must
+    have received the central node's changes in a merge round within `max_staleness` seconds.
+    """
+
+    # Partial aggregates computed on each node, and how the coordinator merges them
+    PARTIALS = {
+        'count': ['COUNT({column})'],
+        'sum': ['SUM({column})'],
+        'min': ['MIN({column})'],
+        'max': ['MAX({column})'],
+        'avg': ['SUM({column})', 'COUNT({column})'],
+    }
+
+    def __init__(self, central_node, replica_nodes: List = None, replication_mode: str = 'primary',
+                 max_version_lag: int = 0, max_staleness: float = 15.0, table_name: str = 'steam_games'):
+        self.central_node = central_node
+        self.replica_nodes = replica_nodes or []
+        self.replication_mode = replication_mode
+        self.max_version_lag = max_version_lag
+        self.max_staleness = max_staleness
+        self.table_name = table_name
+
+        # One dedicated connection per node so the pieces never share a connection with the Flask handlers
+        self.connections = {}
+        self.connections_lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=1 + len(self.replica_nodes), thread_name_prefix='scatter-gather')
+
+    def get_connection(self, node):
+        with self.connections_lock:
+            conn = self.connections.get(node.id)
+            if conn is None or conn.closed:
+                conn = node.connect_to_database(node.id)
+                conn.autocommit = True
+                self.connections[node.id] = conn
+            return conn
+
+    def get_eligible_nodes(self) -> Tuple[List, Dict[str, Any], Dict[str, str]]:
+        """
+        Return the nodes allowed to serve a piece of the read, the staleness of every replica
+        (commits behind in primary mode, seconds since its last merge in merge mode), and the
+        excluded replicas with the reason.
+        """
+        now = time.time()
+        eligible = [self.central_node]
+        staleness = {self.central_node.id: 0}
+        excluded = {}
+        for node in self.replica_nodes:
+            if self.replication_mode == 'merge':
+                last_sync = self.central_node.replica_sync_times.get(node.id)
+                staleness[node.id] = None if last_sync is None else round(now - last_sync, 3)
+                current = last_sync is not None and now - last_sync <= self.max_staleness
+                reason = f'not merged within {self.max_staleness}s'
+            else:
+                staleness[node.id] = self.central_node.commit_version - node.applied_version
+                current = staleness[node.id] <= self.max_version_lag
+                reason = f'{staleness[node.id]} commits behind'
+
+            if not node.is_available:
+                excluded[node.id] = 'unavailable'
+            elif not current:
+                excluded[node.id] = reason
+            else:
+                eligible.append(node)
+        return eligible, staleness, excluded
+
+    def get_ranges(self, node_count: int) -> List[Tuple[int, int]]:
+        """
+        Split [MIN(game_id), MAX(game_id)] of the central node into `node_count` contiguous ranges.
+        """
+        with self.get_connection(self.central_node).cursor() as cur:
+            cur.execute(f"SELECT MIN(game_id), MAX(game_id) FROM {self.table_name}")
+            low, high = cur.fetchone()
+        if low is None:
+            return []
+
+        step = (high - low + node_count) // node_count
+        return [(low + i * step, min(high, low + (i + 1) * step - 1))
+                for i in range(node_count) if low + i * step <= high]
+
+    def run_piece(self, node, query: str, params: tuple) -> Dict[str, Any]:
+        start = time.time()
+        with self.get_connection(node).cursor() as cur:
+            cur.execute(query, params)
+            rows = cur.fetchall()
+        return {'node': node.id, 'rows': rows, 'elapsed': round(time.time() - start, 4)}
+
+    def scatter(self, build_query, where: str, params: tuple) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        eligible, staleness, excluded = self.get_eligible_nodes()
+        ranges = self.get_ranges(len(eligible))
+
+        futures = []
+        for node, (low, high) in zip(eligible, ranges):
+            range_filter = "game_id BETWEEN %s AND %s"
+            piece_where = f"({where}) AND {range_filter}" if where else range_filter
+            futures.append(self.pool.submit(self.run_piece, node, build_query(piece_where),
+                                            tuple(params or ()) + (low, high)))
+        pieces = [future.result() for future in futures]
+
+        plan = {
+            'ranges': {node.id: [low, high] for node, (low, high) in zip(eligible, ranges)},
+            'staleness': staleness,
+            'excluded': excluded,
+            'piece_elapsed': {piece['node']: piece['elapsed'] for piece in pieces},
+        }
+        return pieces, plan
+
+    def aggregate(self, aggregates: Dict[str, Tuple[str, str]], where: str = None, params: tuple = None,
+                  group_by: List[str] = None) -> Dict[str, Any]:
+        """
+        Compute aggregates over steam_games across the cluster.
+
+        Args:
+            aggregates: Output name -> (function, column), e.g. {'avg_price': ('avg', 'price')}.
+                Functions: count, sum, min, max, avg. Use '*' as the column for COUNT(*).
+            where: Optional filter pushed down to every node, with %s placeholders.
+            params: Values for the placeholders in `where`.
+            group_by: Optional list of columns to group by.
+
+        Returns:
+            Dict with the merged 'rows' (list of dicts) and the execution 'plan'.
+        """
+        group_by = group_by or []
+        partial_columns = []
+        for name, (function, column) in aggregates.items():
+            if function not in self.PARTIALS:
+                raise ValueError(f'Unsupported aggregate: {function}')
+            partial_columns += [template.format(column=column) for template in self.PARTIALS[function]]
+
+        def build_query(piece_where: str) -> str:
+            query = f"SELECT {', '.join(group_by + partial_columns)} FROM {self.table_name} WHERE {piece_where}"
+            if group_by:
+                query += f" GROUP BY {', '.join(group_by)}"
+            return query
+
+        start = time.time()
+        pieces, plan = self.scatter(build_query, where, params)
+
+        # Merge partial rows per group
+        merged = {}
+        for piece in pieces:
+            for row in piece['rows']:
+                key, values = tuple(row[:len(group_by)]), list(row[len(group_by):])
+                if key not in merged:
+                    merged[key] = values
+                    continue
+                acc = merged[key]
+                i = 0
+                for function, _ in aggregates.values():
+                    for _ in self.PARTIALS[function]:
+                        acc[i] = self.merge_partial(function, acc[i], values[i])
+                        i += 1
+
+        rows = []
+        for key, values in merged.items():
+            row = dict(zip(group_by, key))
+            i = 0
+            for name, (function, _) in aggregates.items():
+                if function == 'avg':
+                    total, count = values[i], values[i + 1]
+                    row[name] = total / count if count else None
+                    i += 2
+                else:
+                    row[name] = values[i]
+                    i += 1
+            rows.append(row)
+
+        plan['elapsed'] = round(time.time() - start, 4)
+        return {'rows': rows, 'plan': plan}
+
+    def scan(self, columns: List[str], where: str = None, params: tuple = None) -> Dict[str, Any]:
+        """
+        Read matching rows from every range concurrently and return them ordered by game_id.
+        `columns` must include game_id.
+        """
+        def build_query(piece_where: str) -> str:
+            return f"SELECT {', '.join(columns)} FROM {self.table_name} WHERE {piece_where}"
+
+        start = time.time()
+        pieces, plan = self.scatter(build_query, where, params)
+        game_id_index = columns.index('game_id')
+        rows = sorted((row for piece in pieces for row in piece['rows']), key=lambda row: row[game_id_index])
+        plan['elapsed'] = round(time.time() - start, 4)
+        return {'rows': rows, 'plan': plan}
+
+    @staticmethod
+    def merge_partial(function: str, acc, value):
+        if value is None:
+            return acc
+        if acc is None:
+            return value
+        if function == 'min':
+            return min(acc, value)
+        if function == 'max':
+            return max(acc, value)
+        return acc + value
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        with self.connections_lock:
+            for conn in self.connections.values():
+                conn.close()
+            self.connections.clear()
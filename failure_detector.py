@@ -0,0 +1,228 @@
+import time
+import threading
+import logging
+from typing import List, Dict, Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class FailureDetector:
+    """
+    Heartbeat-based failure detector for a set of DatabaseNodes.
+
+    Every node is probed with `SELECT 1` on its own heartbeat connection every `heartbeat_interval`
+    seconds; a node that is marked unavailable (e.g. by simulate_crash) misses its heartbeat as well.
+    A node is suspected once no heartbeat succeeded for `suspicion_timeout` seconds.
+    """
+
+    def __init__(self, nodes: List, heartbeat_interval: float = 1.0, suspicion_timeout: float = 3.0,
+                 on_suspect: Callable = None, on_recover: Callable = None):
+        self.nodes = nodes
+        self.heartbeat_interval = heartbeat_interval
+        self.suspicion_timeout = suspicion_timeout
+        self.on_suspect = on_suspect
+        self.on_recover = on_recover
+
+        now = time.time()
+        self.last_heartbeat = {node.id: now for node in nodes}
+        self.suspected = set()
+        self.probe_connections = {}
+        self.lock = threading.Lock()
+        self.threads = []
+        self.stop_event = threading.Event()
+
+    def probe(self, node) -> bool:
+        if not node.is_available:
+            return False
+        try:
+            conn = self.probe_connections.get(node.id)
+            if conn is None or conn.closed:
+                conn = node.connect_to_database(node.id)
+                conn.autocommit = True
+                self.probe_connections[node.id] = conn
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+                cur.fetchone()
+            return True
+        except Exception:
+            conn = self.probe_connections.pop(node.id, None)
+            if conn is not None and not conn.closed:
+                conn.close()
+            return False
+
+    def heartbeat_loop(self, node):
+        while not self.stop_event.is_set():
+            alive = self.probe(node)
+            now = time.time()
+            callback = None
+
+            with self.lock:
+                if alive:
+                    self.last_heartbeat[node.id] = now
+                    if node.id in self.suspected:
+                        self.suspected.discard(node.id)
+                        callback = self.on_recover
+                elif node.id not in self.suspected and now - self.last_heartbeat[node.id] > self.suspicion_timeout:
+                    self.suspected.add(node.id)
+                    callback = self.on_suspect
+
+            if callback:
+                try:
+                    callback(node, self.last_heartbeat[node.id], now)
+                except Exception as e:
+                    logger.error(f"Failure detector callback failed for {node.id}: {e}")
+
+            self.stop_event.wait(self.heartbeat_interval)
+
+    def start(self):
+        """
+        Start one heartbeat thread per node, so a hanging probe cannot delay the others.
+        """
+        if self.threads:
+            return
+        self.stop_event.clear()
+        for node in self.nodes:
+            thread = threading.Thread(target=self.heartbeat_loop, args=(node,), daemon=True,
+                                      name=f"heartbeat-{node.id}")
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        for conn in self.probe_connections.values():
+            if not conn.closed:
+                conn.close()
+        self.probe_connections.clear()
+
+    def status(self) -> Dict[str, Any]:
+        now = time.time()
+        with self.lock:
+            return {
+                node.id: {
+                    'suspected': node.id in self.suspected,
+                    'seconds_since_heartbeat': round(now - self.last_heartbeat[node.id], 3)
+                }
+                for node in self.nodes
+            }
+
+
+class FailoverManager:
+    """
+    Promotes the most up-to-date replica to central when the failure detector suspects the central node,
+    and lets the old central rejoin as a replica once it answers heartbeats again. If no replica can take
+    over, the promotion is retried every heartbeat interval until one can or the central recovers.
+    """
+
+    def __init__(self, central_node, nodes: List, heartbeat_interval: float = 1.0,
+                 suspicion_timeout: float = 3.0, replication_interval: int = 60):
+        self.central = central_node
+        self.nodes = nodes
+        self.replication_interval = replication_interval
+        self.failover_history = []
+        self.lock = threading.Lock()
+        self.retry_timer = None
+        self.detector = FailureDetector(nodes, heartbeat_interval, suspicion_timeout,
+                                        on_suspect=self.handle_suspect, on_recover=self.handle_recover)
+
+    def start(self):
+        self.detector.start()
+
+    def stop(self):
+        if self.retry_timer:
+            self.retry_timer.cancel()
+        self.detector.stop()
+
+    def choose_new_central(self, old_central):
+        # Most up-to-date replica: the one that has applied the most commit versions
+        candidates = [node for node in self.nodes
+                      if node is not old_central and node.id not in self.detector.suspected and node.is_available]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda node: (node.applied_version,
+                                                 old_central.replica_sync_times.get(node.id, 0)))
+
+    def schedule_retry(self, node, last_heartbeat: float):
+        def retry():
+            if node is self.central and node.id in self.detector.suspected:
+                self.handle_suspect(node, last_heartbeat, time.time())
+
+        self.retry_timer = threading.Timer(self.detector.heartbeat_interval, retry)
+        self.retry_timer.daemon = True
+        self.retry_timer.start()
+
+    def handle_suspect(self, node, last_heartbeat: float, suspected_at: float):
+        with self.lock:
+            if node is not self.central:
+                logger.warning(f"Replica {node.id} suspected down")
+                return
+
+            old_central = node
+            new_central = self.choose_new_central(old_central)
+            if new_central is None:
+                logger.error(f"Central node {old_central.id} suspected down but no replica can take over yet")
+                self.schedule_retry(old_central, last_heartbeat)
+                return
+
+            # Demote the old central; its replication thread exits on its next wake-up
+            old_central.is_central = False
+            old_central.stop_replication.set()
+
+            # Rewire replication: the new central fans out to every other node, including the old central,
+            # and cascading forwarders are switched off so no node receives the change stream twice
+            new_central.is_central = True
+            new_central.slave_nodes = [other.id for other in self.nodes if other is not new_central]
+            for other in self.nodes:
+                if other is not new_central:
+                    other.slave_nodes = []
+            new_central.replica_sync_times = dict(old_central.replica_sync_times)
+            # Keep consistency tokens monotonic across the failover. Writes the old central committed but
+            # never replicated are lost with it; the new central's data now stands for every issued version,
+            # so tokens up to it are served instead of waiting for writes that will never arrive
+            new_central.commit_version = max(new_central.commit_version, old_central.commit_version)
+            if new_central.applied_version < new_central.commit_version:
+                logger.warning(f"{new_central.id} is promoted {new_central.commit_version - new_central.applied_version}"
+                               f" versions behind {old_central.id}; those writes are lost")
+                new_central.mark_applied(new_central.commit_version)
+            self.central = new_central
+            new_central.start_periodic_replication(self.replication_interval)
+
+            promoted_at = time.time()
+            went_down_at = max(old_central.last_crash_time or 0, last_heartbeat)
+            event = {
+                'old_central': old_central.id,
+                'new_central': new_central.id,
+                'last_heartbeat': last_heartbeat,
+                'suspected_at': suspected_at,
+                'promoted_at': promoted_at,
+                'detection_seconds': round(suspected_at - went_down_at, 3),
+                'promotion_seconds': round(promoted_at - suspected_at, 3),
+                'failover_seconds': round(promoted_at - went_down_at, 3),
+                'rejoined_at': None
+            }
+            self.failover_history.append(event)
+            logger.warning(f"Promoted {new_central.id} to central after {old_central.id} failed "
+                           f"(failover took {event['failover_seconds']}s)")
+
+    def handle_recover(self, node, last_heartbeat: float, recovered_at: float):
+        with self.lock:
+            if node is self.central:
+                return
+            for event in reversed(self.failover_history):
+                if event['old_central'] == node.id and event['rejoined_at'] is None:
+                    event['rejoined_at'] = recovered_at
+                    break
+            central = self.central
+
+        # Bring the recovered node up to date with the current central in the background
+        logger.info(f"{node.id} rejoined as a replica of {central.id}")
+        threading.Thread(target=central.replicate_data, daemon=True).start()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'central': self.central.id,
+            'heartbeats': self.detector.status(),
+            'failovers': self.failover_history
+        }
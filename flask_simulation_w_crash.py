@@ -6,25 +6,63 @@ import threading
 import time
 import logging
 from typing import List, Dict, Any
+import atexit
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from failure_detector import FailoverManager
+from topology import Topology
+from node_lifecycle import NodeLifecycle
+from merge_replication import MergeReplicator
+from consistency import StaleReadError, choose_read_node
+from result_cache import ResultCache
+from index_advisor import PlanCollector, IndexAdvisor
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Node connection settings and replication tree (set TOPOLOGY_FILE to use another config)
+TOPOLOGY = Topology.load()
+
 class DatabaseNode:
+    # All nodes by id, so a replica can forward the change stream to its own children
+    registry: Dict[str, 'DatabaseNode'] = {}
+    # Records executed statements and samples their query plans (see index_advisor.py)
+    plan_collector: PlanCollector = None
+
     def __init__(self, node_id: str, is_central: bool = False, slave_nodes: List[str] = None):
         self.id = node_id
         self.is_central = is_central
-        self.conn = self.connect_to_database(node_id)
+        self.conn = None  # opened lazily by ensure_connected()
+        self.conn_lock = threading.Lock()
         self.transactions = {}
         self.current_tx = 'None'
         
         # Track slave nodes for replication
         self.slave_nodes = slave_nodes or []
+        self.replica_sync_times = {}  # slave node id -> time of its last successful replication
         
         # Replication settings
         self.replication_interval = 60  # Default: replicate every 60 seconds
         self.replication_thread = None
         self.stop_replication = threading.Event()
+
+        # Cascading replication: this node forwards changes to its own slave nodes on a separate thread
+        self.forwarder = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'forward-{node_id}')
+        DatabaseNode.registry[node_id] = self
+
+        # Lifecycle: transactions in flight are drained before shutdown
+        self.in_flight = 0
+        self.in_flight_changed = threading.Condition()
+        self.draining = False
+        self.scheduler_lock = threading.Lock()
+
+        # Read-your-writes: commit versions issued by the central node, and the newest one applied here
+        self.commit_version = 0
+        self.applied_version = 0
+        self.version_changed = threading.Condition()
+
+        # Results of read-only transactions, invalidated whenever this node's data changes
+        self.result_cache = ResultCache()
         
          # Crash and Recovery settings
         self.recovery_log = {}
@@ -35,23 +73,55 @@ class DatabaseNode:
         self.last_crash_time = None
 
     def connect_to_database(self, node_id: str):
-        if node_id == 'Node-1':
-            return psycopg2.connect(
-                host='localhost', port=5432, database='steam_games_central',
-                user='admin', password='we<3stadvdb'
-            )
-        elif node_id == 'Node-2':
-            return psycopg2.connect(
-                host='localhost', port=5433, database='steam_games_update',
-                user='admin', password='we<3stadvdb' 
-            )
-        elif node_id == 'Node-3':
-            return psycopg2.connect(
-                host='localhost', port=5434, database='steam_games_replica',
-                user='admin', password='we<3stadvdb'
-            )
-        else:
-            raise ValueError(f'Invalid node ID: {node_id}')
+        return TOPOLOGY.connect(node_id)
+
+    def ensure_connected(self):
+        """
+        Open the node's database connection on first use, or after it was closed.
+        """
+        # A crashed node stays disconnected until recover() reconnects it
+        if not self.is_available:
+            return None
+        with self.conn_lock:
+            if self.conn is None or self.conn.closed:
+                self.conn = self.connect_to_database(self.id)
+        return self.conn
+
+    def mark_applied(self, version: int):
+        """
+        Record that this node's data now includes every write up to commit `version`.
+        """
+        with self.version_changed:
+            if version > self.applied_version:
+                self.applied_version = version
+                self.version_changed.notify_all()
+
+    def mark_applied_next(self, version: int) -> bool:
+        """
+        Record a single replicated statement with commit `version`. It only counts when it directly follows
+        the applied version; after a missed statement the node waits for the next full-table sync.
+        """
+        with self.version_changed:
+            if version != self.applied_version + 1:
+                return False
+            self.applied_version = version
+            self.version_changed.notify_all()
+            return True
+
+    def wait_for_version(self, version: int, timeout: float) -> bool:
+        """
+        Wait up to `timeout` seconds until this node has applied commit `version`.
+        """
+        with self.version_changed:
+            return self.version_changed.wait_for(lambda: self.applied_version >= version, timeout)
+
+    def drain(self, timeout: float) -> bool:
+        """
+        Stop accepting transactions and wait up to `timeout` seconds for in-flight ones to finish.
+        """
+        with self.in_flight_changed:
+            self.draining = True
+            return self.in_flight_changed.wait_for(lambda: self.in_flight == 0, timeout)
 
     def begin_transaction(self, isolation_level: str) -> str:
         if not self.is_available:
@@ -73,7 +143,48 @@ class DatabaseNode:
         self.current_tx = tx_id
         return tx_id
 
-    def execute_transaction(self, tx_id: str, query: str, params: tuple = None, max_retries: int = 3, retry_delay: float = 1.0) -> bool:
+    def execute_transaction(self, tx_id: str, query: str, params: tuple = None, max_retries: int = 3, retry_delay: float = 1.0,
+                            consistency_token: int = None, wait_timeout: float = 2.0) -> bool:
+        with self.in_flight_changed:
+            if self.draining:
+                raise RuntimeError(f'{self.id} is shutting down')
+            self.in_flight += 1
+        try:
+            # Read-your-writes: do not run before this node has applied the client's last write
+            if consistency_token and not self.wait_for_version(int(consistency_token), wait_timeout):
+                raise StaleReadError(f'{self.id} has not applied version {consistency_token} '
+                                     f'(applied: {self.applied_version})')
+            if ResultCache.cacheable(query) and self.is_available:
+                return self.run_cached_read(tx_id, query, params, max_retries, retry_delay)
+            return self.run_transaction(tx_id, query, params, max_retries, retry_delay)
+        finally:
+            with self.in_flight_changed:
+                self.in_flight -= 1
+                self.in_flight_changed.notify_all()
+
+    def run_cached_read(self, tx_id: str, query: str, params: tuple = None, max_retries: int = 3, retry_delay: float = 1.0) -> bool:
+        """
+        Serve a read-only transaction from the result cache, or run it and cache its output.
+        """
+        tx = self.transactions.get(tx_id)
+        if tx is None or tx['status'] != 'ACTIVE':
+            return self.run_transaction(tx_id, query, params, max_retries, retry_delay)
+
+        key = ResultCache.make_key(query, params, tx['isolation_level'])
+        output = self.result_cache.get(key)
+        if output is not None:
+            tx['output'] = output
+            tx['status'] = 'COMMITTED'
+            tx['cached'] = True
+            return True
+
+        generation = self.result_cache.generation
+        started = time.perf_counter()
+        result = self.run_transaction(tx_id, query, params, max_retries, retry_delay)
+        self.result_cache.put(key, query, tx['output'], time.perf_counter() - started, generation)
+        return result
+
+    def run_transaction(self, tx_id: str, query: str, params: tuple = None, max_retries: int = 3, retry_delay: float = 1.0) -> bool:
         if tx_id not in self.transactions or self.transactions[tx_id]['status'] != 'ACTIVE':
             raise ValueError('Invalid transaction')
         
@@ -82,6 +193,7 @@ class DatabaseNode:
 
         tx = self.transactions[tx_id]
         retries = 0
+        self.ensure_connected()
 
         while retries <= max_retries:
             try:
@@ -89,18 +201,34 @@ class DatabaseNode:
                 self.conn.autocommit = False
                 with self.conn.cursor() as cur:
                     cur.execute(f"BEGIN; SET TRANSACTION ISOLATION LEVEL {tx['isolation_level'].replace('_', ' ')};")
+                    started = time.perf_counter()
                     cur.execute(query)
                     tx['output'] = str(cur.fetchall())
+                    elapsed = time.perf_counter() - started
 
+                    is_write = cur.statusmessage.split()[0] in ('INSERT', 'UPDATE', 'DELETE')
                     self.conn.commit()
                     tx['status'] = 'COMMITTED'
-
-                    if self.is_central and tx['status'] == 'COMMITTED':
+                    if is_write:
+                        self.result_cache.invalidate_for_write(query)
+                    if DatabaseNode.plan_collector:
+                        DatabaseNode.plan_collector.record(self.id, query, elapsed)
+
+                    # Writes committed on the central node get a consistency token for later reads
+                    if self.is_central and is_write:
+                        with self.version_changed:
+                            self.commit_version += 1
+                            tx['consistency_token'] = self.commit_version
+                        self.mark_applied(tx['consistency_token'])
+
+                    # In merge mode, the merger ships committed changes between all nodes instead
+                    if self.is_central and tx['status'] == 'COMMITTED' and TOPOLOGY.replication_mode == 'primary':
                         replication_data = {
                             'query': query,
                             'params': params or ()
                         }
-                        self.replicate_data(transaction_data=replication_data)
+                        self.replicate_data(transaction_data=replication_data,
+                                            version=tx.get('consistency_token', self.applied_version))
                         
                     # Store operation for potential recovery
                     self.recovery_log[tx_id]['operation'] = cur.query
@@ -137,7 +265,7 @@ class DatabaseNode:
     
     ### REPLICATION MECHANISM ###
     
-    def replicate_data(self, table_name: str = 'steam_games', transaction_data: Dict = None) -> Dict[str, Any]:
+    def replicate_data(self, table_name: str = 'steam_games', transaction_data: Dict = None, version: int = None) -> Dict[str, Any]:
         """
         Replicate data from master node to slave nodes.
         
@@ -151,11 +279,12 @@ class DatabaseNode:
         if not self.is_central:
             raise ValueError("Only master node can initiate replication")
 
-        # Replication results
-        replication_status = {}
+        # Every write committed so far is part of what is replicated below
+        if version is None:
+            version = self.applied_version
 
         # Fetch data to be replicated
-        with self.conn.cursor() as cur:
+        with self.ensure_connected().cursor() as cur:
             if transaction_data:
                 # Replicate specific transaction data
                 cur.execute(transaction_data['query'], transaction_data.get('params', ()))
@@ -165,6 +294,27 @@ class DatabaseNode:
                 cur.execute(f"SELECT * FROM {table_name}")
                 master_data = cur.fetchall()
 
+        return self.push_replication(table_name, master_data, transaction_data, origin=self, version=version)
+
+    def push_replication(self, table_name: str, master_data: List[tuple], transaction_data: Dict,
+                         origin: 'DatabaseNode', version: int = 0) -> Dict[str, Any]:
+        """
+        Apply a replicated transaction or table snapshot to this node's direct slave nodes. Slaves that
+        have slave nodes of their own forward it down the tree, so each node only feeds its children.
+        
+        Args:
+            table_name (str): Name of the replicated table.
+            master_data (List[tuple]): Rows read from the master node.
+            transaction_data (Dict): Query and params of a single replicated transaction, or None.
+            origin (DatabaseNode): Master node that started the replication; records sync times.
+            version (int): Central commit version included in the replicated data.
+        
+        Returns:
+            Dict tracking replication status for each direct slave node.
+        """
+        # Replication results
+        replication_status = {}
+
         # Replicate to each slave node
         for slave_node_id in self.slave_nodes:
             try:
@@ -193,6 +343,15 @@ class DatabaseNode:
                     
                     # Commit the transaction
                     slave_conn.commit()
+                    origin.replica_sync_times[slave_node_id] = time.time()
+                    slave_node = DatabaseNode.registry.get(slave_node_id)
+                    if slave_node:
+                        if transaction_data:
+                            slave_node.mark_applied_next(version)
+                            slave_node.result_cache.invalidate_for_write(transaction_data['query'])
+                        else:
+                            slave_node.mark_applied(version)
+                            slave_node.result_cache.invalidate(table_name)
                     
                     replication_status[slave_node_id] = {
                         'status': 'SUCCESS',
@@ -202,6 +361,11 @@ class DatabaseNode:
                 # Close slave connection
                 slave_conn.close()
 
+                # Cascade to the slave's own children
+                if slave_node and slave_node.slave_nodes:
+                    slave_node.forward_replication(table_name, master_data, transaction_data, origin, version)
+                    replication_status[slave_node_id]['forwarded_to'] = list(slave_node.slave_nodes)
+
             except Exception as e:
                 replication_status[slave_node_id] = {
                     'status': 'FAILED',
@@ -210,6 +374,19 @@ class DatabaseNode:
 
         return replication_status
 
+    def forward_replication(self, table_name: str, master_data: List[tuple], transaction_data: Dict,
+                            origin: 'DatabaseNode', version: int = 0):
+        """
+        Queue a replicated change for this node's slave nodes on its forwarding thread.
+        """
+        def forward():
+            statuses = self.push_replication(table_name, master_data, transaction_data, origin, version)
+            for slave_node_id, status in statuses.items():
+                if status['status'] == 'FAILED':
+                    logger.error(f"Cascading replication {self.id} -> {slave_node_id} failed: {status['error']}")
+
+        self.forwarder.submit(forward)
+
     def start_periodic_replication(self, interval: int = 60):
         """
         Start a background thread for periodic data replication.
@@ -220,29 +397,46 @@ class DatabaseNode:
         if not self.is_central:
             raise ValueError("Only master node can start periodic replication")
 
-        self.replication_interval = interval
-        self.stop_replication.clear()
+        # Full-table pushes would overwrite writes made on other nodes in merge mode
+        if TOPOLOGY.replication_mode == 'merge':
+            return
 
-        def replicate_periodically():
-            while not self.stop_replication.is_set():
-                try:
-                    self.replicate_data()
-                except Exception as e:
-                    print(f"Replication error: {e}")
-                
-                # Sleep for the specified interval
-                time.sleep(self.replication_interval)
+        with self.scheduler_lock:
+            self.replication_interval = interval
 
-        self.replication_thread = threading.Thread(target=replicate_periodically, daemon=True)
-        self.replication_thread.start()
+            # One scheduler per node: later calls only update the interval
+            if self.replication_thread and self.replication_thread.is_alive():
+                if not self.stop_replication.is_set():
+                    return
+                # A stopped scheduler is still finishing its last round; wait for it before restarting
+                self.replication_thread.join()
+
+            self.stop_replication.clear()
+
+            def replicate_periodically():
+                while not self.stop_replication.is_set():
+                    try:
+                        self.replicate_data()
+                    except Exception as e:
+                        print(f"Replication error: {e}")
+                    
+                    # Sleep for the specified interval, waking up early when stopped
+                    self.stop_replication.wait(self.replication_interval)
+
+            self.replication_thread = threading.Thread(target=replicate_periodically, daemon=True,
+                                                       name=f'replication-{self.id}')
+            self.replication_thread.start()
 
     def stop_periodic_replication(self):
         """
         Stop the periodic replication thread.
         """
-        if self.replication_thread and self.replication_thread.is_alive():
-            self.stop_replication.set()
-            self.replication_thread.join()
+        with self.scheduler_lock:
+            if self.replication_thread and self.replication_thread.is_alive():
+                self.stop_replication.set()
+                # Let an in-progress replication finish
+                if self.replication_thread is not threading.current_thread():
+                    self.replication_thread.join()
         
     ### CRASH AND RECOVERY ###
     
@@ -280,8 +474,12 @@ class DatabaseNode:
         """
         if self.recovery_thread and self.recovery_thread.is_alive():
             self.stop_recovery.set()
-            self.recovery_thread.join()
-            self.start_periodic_replication()
+            # recover() runs on the recovery thread itself, which cannot join itself
+            if self.recovery_thread is not threading.current_thread():
+                self.recovery_thread.join()
+            # A central node that was demoted by failover while down rejoins as a plain replica
+            if self.is_central:
+                self.start_periodic_replication()
 
     def simulate_crash(self):
         """Simulate node crash by closing connection and marking as unavailable"""
@@ -290,6 +488,7 @@ class DatabaseNode:
         self.conn = None
         self.is_available = False
         self.last_crash_time = time.time()
+        self.result_cache.invalidate()
         logger.warning(f"Node {self.id} has crashed")
         
         # Start automatic recovery attempts
@@ -306,6 +505,7 @@ class DatabaseNode:
             
             # Replay recovery log to ensure consistency
             self.replay_recovery_log()
+            self.result_cache.invalidate()
             
             # Stop the automatic recovery thread
             self.stop_automatic_recovery()
@@ -338,31 +538,100 @@ class DatabaseNode:
 app = Flask(__name__)
 CORS(app)
 
-# Initialize nodes
-central_node = DatabaseNode('Node-1', is_central=True, slave_nodes=['Node-2', 'Node-3'])
-update_node_2 = DatabaseNode('Node-2')
-update_node_3 = DatabaseNode('Node-3')
+# Initialize nodes from the topology; each node replicates to its direct children
+nodes = {
+    node_id: DatabaseNode(node_id, is_central=TOPOLOGY.is_central(node_id), slave_nodes=TOPOLOGY.children(node_id))
+    for node_id in TOPOLOGY.node_ids()
+}
+central_node = nodes[TOPOLOGY.central_id]
+# The case scenarios below use the first two replicas
+update_node_2, update_node_3 = [nodes[node_id] for node_id in TOPOLOGY.replica_ids()[:2]]
+
+# Heartbeat failure detection; `failover.central` is the node that currently accepts central writes
+failover = FailoverManager(central_node, list(nodes.values()),
+                           heartbeat_interval=1.0, suspicion_timeout=3.0)
+
+# Connections are warmed up in the background; replication is scheduled once, not per page view
+lifecycle = NodeLifecycle(list(nodes.values()))
+lifecycle.register(failover)
+
+# Multi-master mode: every node accepts writes and a background merger exchanges changes (last-write-wins)
+merger = None
+if TOPOLOGY.replication_mode == 'merge':
+    merger = MergeReplicator(list(nodes.values()))
+    lifecycle.register(merger)
+
+# Workload-driven indexing: plans of the executed statements, index recommendations applied on every node
+plan_collector = PlanCollector(TOPOLOGY.connect)
+DatabaseNode.plan_collector = plan_collector
+index_advisor = IndexAdvisor(plan_collector, list(nodes.values()))
+lifecycle.register(plan_collector)
+
+atexit.register(lifecycle.shutdown)
 
 @app.route('/')
 def index():
-    central_node.start_periodic_replication()
     return render_template('flask_frontend_with_crash.html')
 
+@app.route('/merge-status', methods=['GET'])
+def get_merge_status():
+    # Rounds, applied rows, conflict counts and merge latency of the merge replicator
+    if merger is None:
+        return jsonify({'status': 'disabled', 'replication_mode': TOPOLOGY.replication_mode})
+    return jsonify({'status': 'enabled', **merger.status()})
+
+@app.route('/cache-stats', methods=['GET'])
+def get_cache_stats():
+    # Hit ratio, evictions, invalidations and saved query time of each node's result cache
+    return jsonify({node_id: node.result_cache.status() for node_id, node in nodes.items()})
+
+@app.route('/query-plans', methods=['GET'])
+def get_query_plans():
+    # Executed statements with their latest plans, and detected plan regressions
+    return jsonify(plan_collector.status())
+
+@app.route('/index-advice', methods=['GET', 'POST'])
+def index_advice():
+    # GET lists recommended indexes; POST creates them on every node
+    try:
+        recommendations = index_advisor.recommend()
+        if request.method == 'POST':
+            return jsonify({'status': 'success', 'applied': recommendations,
+                            'results': index_advisor.apply(recommendations)}), 200
+        return jsonify({'status': 'success', 'recommendations': recommendations}), 200
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/health/live', methods=['GET'])
+def liveness():
+    status = lifecycle.liveness()
+    return jsonify(status), 200 if status['alive'] else 503
+
+@app.route('/health/ready', methods=['GET'])
+def readiness():
+    status = lifecycle.readiness()
+    return jsonify(status), 200 if status['ready'] else 503
+
 @app.route('/case1', methods=['POST'])
 def case1_concurrent_reads():
     # Case #1: Concurrent transactions in two or more nodes are reading the same data item.
     try:
+        # Reads must observe the client's last write: wait for the replica or redirect to one that has it
+        token = (request.get_json(silent=True) or {}).get('consistency_token')
         central_node.current_tx = 'None'
-        tx_node_2 = update_node_2.begin_transaction('READ_COMMITTED')
-        tx_node_3 = update_node_3.begin_transaction('READ_COMMITTED')
+        # The two reads run concurrently, so they must not end up on the same node
+        reader_2 = choose_read_node(update_node_2, list(nodes.values()), token, exclude=[update_node_3])
+        reader_3 = choose_read_node(update_node_3, list(nodes.values()), token, exclude=[reader_2])
+        tx_node_2 = reader_2.begin_transaction('READ_COMMITTED')
+        tx_node_3 = reader_3.begin_transaction('READ_COMMITTED')
 
         def node_2_read():
             query = "SELECT title FROM steam_games WHERE developer = 'Valve';"
-            update_node_2.execute_transaction(tx_node_2, query)
+            reader_2.execute_transaction(tx_node_2, query, consistency_token=token)
 
         def node_3_read():
             query = "SELECT title, price FROM steam_games WHERE price > 10;"
-            update_node_3.execute_transaction(tx_node_3, query)
+            reader_3.execute_transaction(tx_node_3, query, consistency_token=token)
         
         # Run updates concurrently
         thread1 = threading.Thread(target=node_2_read)
@@ -383,17 +652,21 @@ def case2_mix_read_write():
     # Case #2: At least one transaction in the three nodes is writing (update / delete) 
     # and the other concurrent transactions are reading the same data item.
     try:
-        write_tx = central_node.begin_transaction('REPEATABLE_READ')
-        read_tx = update_node_2.begin_transaction('READ_COMMITTED')
+        write_node = failover.central
+        write_tx = write_node.begin_transaction('REPEATABLE_READ')
+        token = (request.get_json(silent=True) or {}).get('consistency_token')
+        # The read never runs on the node doing the concurrent write; after a failover that can be Node-2 itself
+        reader = choose_read_node(update_node_2, list(nodes.values()), token, exclude=[write_node])
+        read_tx = reader.begin_transaction('READ_COMMITTED')
         update_node_3.current_tx = 'None'
 
         def write_in_central():
             query = "UPDATE steam_games SET price = price + 1 WHERE price < 10 RETURNING title, price;"
-            central_node.execute_transaction(write_tx, query)
+            write_node.execute_transaction(write_tx, query)
 
         def read_with_node_2():
             query = "SELECT title, publisher FROM steam_games WHERE price = 14.99;"
-            update_node_2.execute_transaction(read_tx, query)
+            reader.execute_transaction(read_tx, query, consistency_token=token)
         
         # Run updates concurrently
         thread1 = threading.Thread(target=write_in_central)
@@ -405,7 +678,11 @@ def case2_mix_read_write():
         thread1.join()
         thread2.join()
 
-        return jsonify({'status': 'success'}), 200
+        # Pass this token with the next read to see this write
+        return jsonify({
+            'status': 'success',
+            'consistency_token': write_node.transactions[write_tx].get('consistency_token')
+        }), 200
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
@@ -414,9 +691,9 @@ def case3_concurrent_writes():
     # Case #3: Concurrent transactions in two or more nodes are writing (update / delete) the same data item.
     try:
         # Define transactions and queries
-        write_tx = central_node.begin_transaction('SERIALIZABLE')
-        write_tx_2 = update_node_2.begin_transaction('SERIALIZABLE')
-        update_node_3.current_tx = 'None'
+        central_node.current_tx = 'None'
+        write_tx = update_node_2.begin_transaction('SERIALIZABLE')
+        write_tx_2 = update_node_3.begin_transaction('SERIALIZABLE')
 
         def update_data():
             query = "UPDATE steam_games SET price = price - 1 WHERE title = 'Counter-Strike' AND price > 4 RETURNING title, price;"
@@ -446,17 +723,23 @@ def get_node_info():
         'node1': {
             'tx_id': central_node.current_tx,
             'status': central_node.transactions.get(central_node.current_tx, {}).get('status', 'N/A'),
-            'output': central_node.transactions.get(central_node.current_tx, {}).get('output', 'N/A')
+            'output': central_node.transactions.get(central_node.current_tx, {}).get('output', 'N/A'),
+            'consistency_token': central_node.transactions.get(central_node.current_tx, {}).get('consistency_token'),
+            'applied_version': central_node.applied_version
         },
         'node2': {
             'tx_id': update_node_2.current_tx, 
             'status': update_node_2.transactions.get(update_node_2.current_tx, {}).get('status', 'N/A'),
-            'output': update_node_2.transactions.get(update_node_2.current_tx, {}).get('output', 'N/A')
+            'output': update_node_2.transactions.get(update_node_2.current_tx, {}).get('output', 'N/A'),
+            'consistency_token': update_node_2.transactions.get(update_node_2.current_tx, {}).get('consistency_token'),
+            'applied_version': update_node_2.applied_version
         },
         'node3': {
             'tx_id': update_node_3.current_tx,
             'status': update_node_3.transactions.get(update_node_3.current_tx, {}).get('status', 'N/A'),
-            'output': update_node_3.transactions.get(update_node_3.current_tx, {}).get('output', 'N/A')
+            'output': update_node_3.transactions.get(update_node_3.current_tx, {}).get('output', 'N/A'),
+            'consistency_token': update_node_3.transactions.get(update_node_3.current_tx, {}).get('consistency_token'),
+            'applied_version': update_node_3.applied_version
         }
     })
     
@@ -464,12 +747,8 @@ def get_node_info():
 def simulate_crash():
     node_id = request.json.get('node_id')
     
-    if node_id == 'Node-1':
-        central_node.simulate_crash()
-    elif node_id == 'Node-2':
-        update_node_2.simulate_crash()
-    elif node_id == 'Node-3':
-        update_node_3.simulate_crash()
+    if node_id in nodes:
+        nodes[node_id].simulate_crash()
     
     return jsonify({
         'status': 'success', 
@@ -482,17 +761,32 @@ def get_node_recovery_status():
     return jsonify({
         'Node-1': {
             'is_available': central_node.is_available,
+            'is_central': central_node.is_central,
             'last_crash_time': central_node.last_crash_time
         },
         'Node-2': {
             'is_available': update_node_2.is_available,
+            'is_central': update_node_2.is_central,
             'last_crash_time': update_node_2.last_crash_time
         },
         'Node-3': {
             'is_available': update_node_3.is_available,
+            'is_central': update_node_3.is_central,
             'last_crash_time': update_node_3.last_crash_time
         }
     })
 
+@app.route('/failover-status', methods=['GET'])
+def get_failover_status():
+    # Current central node, heartbeat ages, and measured failover times
+    return jsonify(failover.status())
+
+def handle_sigterm(signum, frame):
+    lifecycle.shutdown()
+    raise SystemExit(0)
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    # Background work starts only here; the reloader would run it a second time in its watcher process
+    lifecycle.start()
+    app.run(debug=True, port=5000, use_reloader=False)
\ No newline at end of file
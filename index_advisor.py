@@ -0,0 +1,330 @@
+import re
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from collections import defaultdict
+from statistics import median
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'plan_history.jsonl')
+
+LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+FILTER_COLUMN_PATTERN = re.compile(r"\(*([a-z_][a-z0-9_]*)\)*(?:::[a-z ]+)?\s*(?:=|<>|!=|<=|>=|<|>|~~)", re.IGNORECASE)
+INDEX_COLUMN_PATTERN = re.compile(r'USING \w+ \(([^)]+)\)')
+
+
+def fingerprint(query: str) -> str:
+    """
+    Statement text with literals replaced by `?`, so executions that differ only in values group together.
+    """
+    return ' '.join(LITERAL_PATTERN.sub('?', query).split()).rstrip(';')
+
+
+class PlanCollector:
+    """
+    Records the statements DatabaseNodes execute and samples their query plans.
+
+    `record()` only counts the execution and queues a plan capture; plans are captured on a background
+    thread with a separate connection per node, at most once per statement fingerprint and node every
+    `sample_interval` seconds. Reads are captured with EXPLAIN (ANALYZE, BUFFERS). Writes only get a
+    plain EXPLAIN: ANALYZE would run them, taking row locks and sequence values on the live nodes.
+
+    Every captured plan is appended to the plan history (kept in memory and in `history_file`). A plan is
+    flagged as a regression when it switches from an index scan to a sequential scan, or runs more than
+    `regression_factor` times slower than the median of the earlier plans of the same statement
+    (by estimated cost for writes, which have no measured time).
+    """
+
+    def __init__(self, connect, sample_interval: float = 30.0, regression_factor: float = 2.0,
+                 history_file: str = None, max_history: int = 50):
+        self.connect = connect  # node_id -> new psycopg2 connection
+        self.sample_interval = sample_interval
+        self.regression_factor = regression_factor
+        self.history_file = history_file or os.environ.get('PLAN_HISTORY_FILE', DEFAULT_HISTORY_FILE)
+        self.max_history = max_history
+
+        self.statements = {}  # fingerprint -> {'query', 'executions', 'total_seconds', 'nodes'}
+        self.history = defaultdict(list)  # (fingerprint, node_id) -> captured plan summaries
+        self.regressions = []
+        self.last_sampled = {}
+        self.connections = {}
+        self.lock = threading.Lock()
+        self.pending = queue.Queue()
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    ### RECORDING ###
+
+    def record(self, node_id: str, query: str, elapsed: float):
+        key = fingerprint(query)
+        now = time.time()
+        with self.lock:
+            statement = self.statements.setdefault(
+                key, {'query': query, 'executions': 0, 'total_seconds': 0.0, 'nodes': set()})
+            statement['executions'] += 1
+            statement['total_seconds'] += elapsed
+            statement['nodes'].add(node_id)
+
+            if now - self.last_sampled.get((key, node_id), 0) < self.sample_interval:
+                return
+            self.last_sampled[(key, node_id)] = now
+        self.pending.put((node_id, key, query))
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.capture_loop, daemon=True, name='plan-capture')
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join()
+        for conn in self.connections.values():
+            if not conn.closed:
+                conn.close()
+        self.connections.clear()
+
+    def capture_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                node_id, key, query = self.pending.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self.capture(node_id, key, query)
+            except Exception as e:
+                logger.warning(f"Plan capture on {node_id} failed: {e}")
+                conn = self.connections.pop(node_id, None)
+                if conn is not None and not conn.closed:
+                    conn.close()
+
+    ### PLAN CAPTURE ###
+
+    @staticmethod
+    def is_read_only(query: str) -> bool:
+        statement = query.strip().upper()
+        return statement.startswith('SELECT') and 'FOR UPDATE' not in statement and 'FOR SHARE' not in statement
+
+    def explain(self, node_id: str, query: str) -> Dict[str, Any]:
+        conn = self.connections.get(node_id)
+        if conn is None or conn.closed:
+            conn = self.connect(node_id)
+            self.connections[node_id] = conn
+        # EXPLAIN ANALYZE executes the statement, so only reads are analyzed
+        options = 'ANALYZE, BUFFERS, FORMAT JSON' if self.is_read_only(query) else 'FORMAT JSON'
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SET LOCAL lock_timeout = '1s'; SET LOCAL statement_timeout = '30s'")
+                cur.execute(f"EXPLAIN ({options}) {query.strip().rstrip(';')}")
+                return cur.fetchone()[0][0]
+        finally:
+            conn.rollback()
+
+    def capture(self, node_id: str, key: str, query: str):
+        plan = self.explain(node_id, query)
+        entry = {
+            'captured_at': time.time(),
+            'node': node_id,
+            'fingerprint': key,
+            **summarize_plan(plan)
+        }
+
+        with self.lock:
+            history = self.history[(key, node_id)]
+            regression = self.check_regression(history, entry)
+            if regression:
+                entry['regression'] = regression
+                self.regressions.append(entry)
+                logger.warning(f"Plan regression on {node_id} for {key}: {regression}")
+            history.append(entry)
+            del history[:-self.max_history]
+
+        if self.history_file:
+            with open(self.history_file, 'a') as file:
+                file.write(json.dumps({**entry, 'plan': plan}, default=str) + '\n')
+
+    def check_regression(self, history: List[Dict[str, Any]], entry: Dict[str, Any]) -> Optional[str]:
+        if not history:
+            return None
+        previous = history[-1]
+        if previous['index_scans'] and not entry['index_scans'] and entry['seq_scans']:
+            return f"index scan on {previous['index_scans']} replaced by a sequential scan"
+        if len(history) >= 3:
+            metric, unit = ('execution_ms', 'ms') if entry.get('analyzed', True) else ('total_cost', ' cost')
+            baseline = median(item[metric] or 0 for item in history)
+            if (entry[metric] or 0) > max(baseline * self.regression_factor, baseline + 1.0):
+                return f"{metric} {entry[metric]}{unit} vs median {round(baseline, 3)}{unit}"
+        return None
+
+    ### REPORTING ###
+
+    def status(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'statements': [
+                    {
+                        'fingerprint': key,
+                        'executions': statement['executions'],
+                        'mean_ms': round(1000 * statement['total_seconds'] / statement['executions'], 3),
+                        'nodes': sorted(statement['nodes']),
+                        'latest_plans': {node_id: self.history[(key, node_id)][-1]
+                                         for node_id in sorted(statement['nodes']) if self.history[(key, node_id)]}
+                    }
+                    for key, statement in sorted(self.statements.items(), key=lambda item: -item[1]['total_seconds'])
+                ],
+                'regressions': self.regressions[-20:]
+            }
+
+
+def summarize_plan(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Flatten an EXPLAIN (FORMAT JSON) plan into scan types, filtered columns, timings and buffer counts.
+    """
+    summary = {
+        'analyzed': 'Execution Time' in plan,
+        'execution_ms': round(plan.get('Execution Time', 0.0), 3),
+        'planning_ms': round(plan.get('Planning Time', 0.0), 3),
+        'total_cost': plan['Plan'].get('Total Cost'),
+        'seq_scans': [],
+        'index_scans': [],
+        'filters': [],
+        'shared_hit_blocks': 0,
+        'shared_read_blocks': 0
+    }
+
+    def walk(node):
+        relation = node.get('Relation Name')
+        if node['Node Type'] == 'Seq Scan':
+            summary['seq_scans'].append(relation)
+            if node.get('Filter'):
+                # Selectivity is only measured by ANALYZE; plain EXPLAIN plans leave it unknown
+                selectivity = None
+                if summary['analyzed']:
+                    rows = node.get('Actual Rows', 0) * node.get('Actual Loops', 1)
+                    removed = node.get('Rows Removed by Filter', 0)
+                    selectivity = round(rows / (rows + removed), 4) if rows + removed else 1.0
+                summary['filters'].append({
+                    'relation': relation,
+                    'filter': node['Filter'],
+                    'columns': sorted(set(FILTER_COLUMN_PATTERN.findall(node['Filter']))),
+                    'selectivity': selectivity
+                })
+        elif 'Index' in node['Node Type']:
+            summary['index_scans'].append(node.get('Index Name'))
+        summary['shared_hit_blocks'] += node.get('Shared Hit Blocks', 0)
+        summary['shared_read_blocks'] += node.get('Shared Read Blocks', 0)
+        for child in node.get('Plans', []):
+            walk(child)
+
+    walk(plan['Plan'])
+    return summary
+
+
+class IndexAdvisor:
+    """
+    Recommends btree indexes from the sequential-scan filters in the captured plans, and creates them on
+    every node so all nodes keep the same access paths.
+
+    A column is recommended when sequential scans filtering on it ran at least `min_executions` times
+    with an average selectivity below `max_selectivity`, and no index on the table starts with it.
+    """
+
+    def __init__(self, collector: PlanCollector, nodes: List, table_name: str = 'steam_games',
+                 min_executions: int = 5, max_selectivity: float = 0.3):
+        self.collector = collector
+        self.nodes = nodes
+        self.table_name = table_name
+        self.min_executions = min_executions
+        self.max_selectivity = max_selectivity
+        self.applied = []
+
+    def get_table_info(self, node_id: str):
+        conn = self.collector.connect(node_id)
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s",
+                            (self.table_name,))
+                columns = {row[0] for row in cur.fetchall()}
+                cur.execute("SELECT indexdef FROM pg_indexes WHERE tablename = %s", (self.table_name,))
+                indexed = set()
+                for (definition,) in cur.fetchall():
+                    match = INDEX_COLUMN_PATTERN.search(definition)
+                    if match:
+                        indexed.add(match.group(1).split(',')[0].strip().strip('"'))
+            return columns, indexed
+        finally:
+            conn.close()
+
+    def recommend(self) -> List[Dict[str, Any]]:
+        columns, indexed = self.get_table_info(self.nodes[0].id)
+
+        # History is kept per (statement, node); a statement's executions are counted once per column
+        usage = defaultdict(lambda: {'selectivities': [], 'statements': set()})
+        with self.collector.lock:
+            for (key, _), history in self.collector.history.items():
+                if not history:
+                    continue
+                for item in history[-1]['filters']:
+                    if item['relation'] != self.table_name:
+                        continue
+                    for column in item['columns']:
+                        if column in columns and column not in indexed:
+                            if item['selectivity'] is not None:
+                                usage[column]['selectivities'].append(item['selectivity'])
+                            usage[column]['statements'].add(key)
+            for stats in usage.values():
+                stats['executions'] = sum(self.collector.statements[key]['executions']
+                                          for key in stats['statements'])
+
+        recommendations = []
+        for column, stats in usage.items():
+            if not stats['selectivities']:
+                continue
+            selectivity = sum(stats['selectivities']) / len(stats['selectivities'])
+            if stats['executions'] >= self.min_executions and selectivity <= self.max_selectivity:
+                recommendations.append({
+                    'index': f'idx_{self.table_name}_{column}',
+                    'column': column,
+                    'definition': f'CREATE INDEX IF NOT EXISTS idx_{self.table_name}_{column} '
+                                  f'ON {self.table_name} USING btree ({column})',
+                    'executions': stats['executions'],
+                    'avg_selectivity': round(selectivity, 4),
+                    'statements': sorted(stats['statements'])
+                })
+        return sorted(recommendations, key=lambda item: -item['executions'])
+
+    def apply(self, recommendations: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Create the recommended indexes on every node. CONCURRENTLY keeps the table writable meanwhile.
+        """
+        results = {}
+        for node in self.nodes:
+            results[node.id] = {}
+            try:
+                conn = self.collector.connect(node.id)
+            except Exception as e:
+                results[node.id] = {'error': str(e)}
+                continue
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    for item in recommendations:
+                        try:
+                            cur.execute(item['definition'].replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1))
+                            cur.execute(f"ANALYZE {self.table_name}")
+                            results[node.id][item['index']] = 'CREATED'
+                        except Exception as e:
+                            results[node.id][item['index']] = f'FAILED: {e}'
+            finally:
+                conn.close()
+
+        self.applied.append({'applied_at': time.time(), 'indexes': [item['index'] for item in recommendations],
+                             'results': results})
+        return results
@@ -8,6 +8,11 @@ CREATE TABLE IF NOT EXISTS public.steam_games (
     last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Access paths for the case queries (same on every node; see index_advisor.py)
+CREATE INDEX IF NOT EXISTS idx_steam_games_price ON steam_games USING btree (price);
+CREATE INDEX IF NOT EXISTS idx_steam_games_developer ON steam_games USING btree (developer);
+CREATE INDEX IF NOT EXISTS idx_steam_games_title ON steam_games USING btree (title);
+
 -- Seed with initial data
 INSERT INTO steam_games (title, developer, publisher, price) VALUES 
 ('Counter-Strike: Global Offensive', 'Valve', 'Valve', 14.99),
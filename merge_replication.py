@@ -0,0 +1,348 @@
+import time
+import threading
+import logging
+from datetime import timedelta
+from typing import List, Dict, Any, Callable
+
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger(__name__)
+
+# Change tracking installed on every node (idempotent). Local writes stamp the row with the commit-time
+# clock and the node that made them; deletes leave a tombstone. Rows applied by the merger keep the
+# version they arrived with because the merger sets `merge.applying` for its own transactions.
+MERGE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS merge_node_identity (
+    node_id VARCHAR(64) PRIMARY KEY
+);
+
+ALTER TABLE {table} ADD COLUMN IF NOT EXISTS origin_node VARCHAR(64);
+
+CREATE TABLE IF NOT EXISTS {table}_tombstones (
+    game_id INTEGER PRIMARY KEY,
+    last_updated TIMESTAMP NOT NULL,
+    origin_node VARCHAR(64)
+);
+
+CREATE INDEX IF NOT EXISTS idx_{table}_origin_version ON {table} (origin_node, last_updated);
+CREATE INDEX IF NOT EXISTS idx_{table}_tombstones_origin_version ON {table}_tombstones (origin_node, last_updated);
+
+CREATE OR REPLACE FUNCTION {table}_track_change() RETURNS trigger AS $$
+BEGIN
+    IF current_setting('merge.applying', true) = 'on' THEN
+        RETURN COALESCE(NEW, OLD);
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO {table}_tombstones (game_id, last_updated, origin_node)
+        VALUES (OLD.game_id, clock_timestamp(), (SELECT node_id FROM merge_node_identity LIMIT 1))
+        ON CONFLICT (game_id) DO UPDATE
+        SET last_updated = EXCLUDED.last_updated, origin_node = EXCLUDED.origin_node;
+        RETURN OLD;
+    END IF;
+    NEW.last_updated := clock_timestamp();
+    NEW.origin_node := (SELECT node_id FROM merge_node_identity LIMIT 1);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS {table}_track_write ON {table};
+CREATE TRIGGER {table}_track_write BEFORE INSERT OR UPDATE ON {table}
+    FOR EACH ROW EXECUTE FUNCTION {table}_track_change();
+
+DROP TRIGGER IF EXISTS {table}_track_delete ON {table};
+CREATE TRIGGER {table}_track_delete AFTER DELETE ON {table}
+    FOR EACH ROW EXECUTE FUNCTION {table}_track_change();
+"""
+
+
+class MergeReplicator:
+    """
+    Multi-master merge replication for steam_games.
+
+    Every node accepts writes. A background merger periodically pulls, from each node, the rows and
+    tombstones that node wrote locally since the last exchange, and applies them to every other node
+    in one set-based statement per batch. Conflicts are resolved per row with last-write-wins on
+    (last_updated, origin_node), or with a pluggable `resolver(local_row, remote_row) -> row`.
+
+    Inserts on different nodes never share a game_id: each node's game_id sequence is given its own
+    residue class (INCREMENT BY the number of nodes, starting above every existing id).
+    """
+
+    def __init__(self, nodes: List, interval: float = 5.0, resolver: Callable = None,
+                 table_name: str = 'steam_games', overlap: float = 5.0):
+        self.nodes = nodes
+        self.interval = interval
+        self.resolver = resolver
+        self.table_name = table_name
+        # Re-read this many seconds before each watermark, so commits that finished after a change
+        # with an older clock value are not skipped. Re-applying a row is a no-op under LWW.
+        self.overlap = timedelta(seconds=overlap)
+
+        self.connections = {}
+        self.installed = set()
+        self.watermarks = {}  # (source id, target id) -> last_updated of the newest change shipped
+        self.stats = {'rounds': 0, 'rows_applied': 0, 'deletes_applied': 0,
+                      'conflicts': 0, 'conflicts_remote_won': 0, 'last_round': None}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def get_connection(self, node):
+        conn = self.connections.get(node.id)
+        if conn is None or conn.closed:
+            conn = node.connect_to_database(node.id)
+            self.connections[node.id] = conn
+        return conn
+
+    def rollback(self, node):
+        conn = self.connections.get(node.id)
+        if conn is not None and not conn.closed:
+            conn.rollback()
+
+    def get_id_base(self) -> int:
+        """
+        Highest game_id on any reachable node.
+        """
+        id_base = 0
+        for node in self.nodes:
+            try:
+                conn = self.get_connection(node)
+                with conn.cursor() as cur:
+                    cur.execute(f"SELECT COALESCE(MAX(game_id), 0) FROM {self.table_name}")
+                    id_base = max(id_base, cur.fetchone()[0])
+                conn.commit()
+            except Exception as e:
+                self.rollback(node)
+                logger.warning(f"Could not read the highest game_id on {node.id}: {e}")
+        return id_base
+
+    def install(self, node, id_base: int):
+        node_count = len(self.nodes)
+        node_index = self.nodes.index(node)
+        conn = self.get_connection(node)
+        with conn.cursor() as cur:
+            cur.execute(MERGE_SCHEMA.format(table=self.table_name))
+            cur.execute("DELETE FROM merge_node_identity")
+            cur.execute("INSERT INTO merge_node_identity (node_id) VALUES (%s)", (node.id,))
+
+            # Disjoint game_ids: node i only hands out ids = i (mod node count), above every existing id
+            cur.execute("SELECT pg_get_serial_sequence(%s, 'game_id')", (self.table_name,))
+            sequence = cur.fetchone()[0]
+            restart = (id_base // node_count + 1) * node_count + node_index
+            cur.execute(f"ALTER SEQUENCE {sequence} INCREMENT BY {node_count} RESTART WITH {restart}")
+
+            # Rows that existed before change tracking are treated as this node's own
+            cur.execute("SET LOCAL merge.applying = 'on'")
+            cur.execute(f"UPDATE {self.table_name} SET origin_node = %s WHERE origin_node IS NULL", (node.id,))
+        conn.commit()
+        self.installed.add(node.id)
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        id_base = self.get_id_base()
+        for node in self.nodes:
+            try:
+                self.install(node, id_base)
+            except Exception as e:
+                self.rollback(node)
+                logger.error(f"Failed to install merge replication on {node.id}: {e}")
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.merge_periodically, daemon=True, name='merge-replication')
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join()
+        for conn in self.connections.values():
+            if not conn.closed:
+                conn.close()
+        self.connections.clear()
+
+    def merge_periodically(self):
+        while not self.stop_event.is_set():
+            try:
+                self.merge_round()
+            except Exception as e:
+                logger.error(f"Merge round failed: {e}")
+            self.stop_event.wait(self.interval)
+
+    def merge_round(self) -> Dict[str, Any]:
+        """
+        Exchange change batches between every pair of available nodes, in both directions.
+        """
+        with self.lock:
+            start = time.time()
+            nodes = [node for node in self.nodes if getattr(node, 'is_available', True)]
+
+            # Nodes that were down at start() join once their change tracking and sequence are installed
+            for node in [node for node in nodes if node.id not in self.installed]:
+                try:
+                    self.install(node, self.get_id_base())
+                except Exception as e:
+                    self.rollback(node)
+                    logger.error(f"Failed to install merge replication on {node.id}: {e}")
+                    nodes.remove(node)
+            round_stats = {'pairs': {}, 'rows_applied': 0, 'conflicts': 0, 'max_lag_seconds': 0.0}
+
+            for source in nodes:
+                try:
+                    batch = self.read_changes(source, nodes)
+                except Exception as e:
+                    logger.error(f"Failed to read changes from {source.id}: {e}")
+                    continue
+
+                for target in nodes:
+                    if target is source:
+                        continue
+                    pair = (source.id, target.id)
+                    try:
+                        pair_stats = self.apply_changes(source, target, batch)
+                    except Exception as e:
+                        self.get_connection(target).rollback()
+                        round_stats['pairs'][f'{source.id}->{target.id}'] = {'status': 'FAILED', 'error': str(e)}
+                        continue
+
+                    if batch['high_watermark'] is not None:
+                        self.watermarks[pair] = batch['high_watermark']
+                    # target now has every change source committed before this round started
+                    source.replica_sync_times[target.id] = start
+                    round_stats['pairs'][f'{source.id}->{target.id}'] = {'status': 'SUCCESS', **pair_stats}
+                    round_stats['rows_applied'] += pair_stats['rows_applied']
+                    round_stats['conflicts'] += pair_stats['conflicts']
+                    round_stats['max_lag_seconds'] = max(round_stats['max_lag_seconds'], pair_stats['max_lag_seconds'])
+                    self.stats['rows_applied'] += pair_stats['rows_applied']
+                    self.stats['deletes_applied'] += pair_stats['deletes_applied']
+                    self.stats['conflicts'] += pair_stats['conflicts']
+                    self.stats['conflicts_remote_won'] += pair_stats['conflicts_remote_won']
+
+            round_stats['merge_seconds'] = round(time.time() - start, 4)
+            self.stats['rounds'] += 1
+            self.stats['last_round'] = round_stats
+            return round_stats
+
+    def read_changes(self, source, nodes: List) -> Dict[str, Any]:
+        """
+        Read the rows and tombstones written locally on `source` since the oldest watermark of its targets.
+        """
+        targets = [(source.id, node.id) for node in nodes if node is not source]
+        marks = [self.watermarks.get(pair) for pair in targets]
+        since = None if not marks or None in marks else min(marks) - self.overlap
+
+        conn = self.get_connection(source)
+        with conn.cursor() as cur:
+            version_filter = "origin_node = %s" + (" AND last_updated > %s" if since else "")
+            args = (source.id, since) if since else (source.id,)
+            cur.execute(f"SELECT * FROM {self.table_name} WHERE {version_filter}", args)
+            columns = [desc[0] for desc in cur.description]
+            rows = cur.fetchall()
+            cur.execute(f"SELECT game_id, last_updated, origin_node FROM {self.table_name}_tombstones "
+                        f"WHERE {version_filter}", args)
+            deletes = cur.fetchall()
+            cur.execute("SELECT LOCALTIMESTAMP")
+            source_now = cur.fetchone()[0]
+        conn.commit()
+
+        versions = [row[columns.index('last_updated')] for row in rows] + [delete[1] for delete in deletes]
+        return {
+            'columns': columns,
+            'rows': rows,
+            'deletes': deletes,
+            'source_now': source_now,
+            'high_watermark': max(versions) if versions else None
+        }
+
+    def apply_changes(self, source, target, batch: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Apply one change batch to `target` in a single transaction, resolving conflicts per row.
+        """
+        table = self.table_name
+        columns = batch['columns']
+        column_list = ', '.join(columns)
+        since = self.watermarks.get((target.id, source.id))
+        stats = {'rows_applied': 0, 'deletes_applied': 0, 'conflicts': 0, 'conflicts_remote_won': 0,
+                 'max_lag_seconds': 0.0}
+        if not batch['rows'] and not batch['deletes']:
+            return stats
+
+        conn = self.get_connection(target)
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL merge.applying = 'on'")
+
+            if batch['rows']:
+                cur.execute(f"CREATE TEMP TABLE incoming (LIKE {table}) ON COMMIT DROP")
+                execute_values(cur, f"INSERT INTO incoming ({column_list}) VALUES %s", batch['rows'])
+
+                # A newer local delete wins over an incoming update
+                cur.execute(f"DELETE FROM incoming i USING {table}_tombstones tb "
+                            f"WHERE tb.game_id = i.game_id AND tb.last_updated >= i.last_updated")
+
+                # Conflict: the target also changed the row locally since it last shipped changes to the source
+                conflict_filter = (f"t.origin_node = %s AND t.last_updated <> i.last_updated"
+                                   + (" AND t.last_updated > %s" if since else ""))
+                conflict_args = (target.id, since) if since else (target.id,)
+                cur.execute(f"SELECT COUNT(*), COUNT(*) FILTER (WHERE (i.last_updated, i.origin_node) > "
+                            f"(t.last_updated, t.origin_node)) FROM incoming i JOIN {table} t USING (game_id) "
+                            f"WHERE {conflict_filter}", conflict_args)
+                stats['conflicts'], stats['conflicts_remote_won'] = cur.fetchone()
+
+                if self.resolver and stats['conflicts']:
+                    self.resolve_conflicts(cur, target, columns, conflict_filter, conflict_args)
+
+                # Last-write-wins upsert: only strictly newer versions replace the target row
+                updates = ', '.join(f"{column} = EXCLUDED.{column}" for column in columns if column != 'game_id')
+                cur.execute(f"INSERT INTO {table} AS t ({column_list}) SELECT {column_list} FROM incoming "
+                            f"ON CONFLICT (game_id) DO UPDATE SET {updates} "
+                            f"WHERE (EXCLUDED.last_updated, EXCLUDED.origin_node) > "
+                            f"(t.last_updated, COALESCE(t.origin_node, ''))")
+                stats['rows_applied'] = cur.rowcount
+
+                oldest = min(row[columns.index('last_updated')] for row in batch['rows'])
+                stats['max_lag_seconds'] = round((batch['source_now'] - oldest).total_seconds(), 3)
+
+            if batch['deletes']:
+                cur.execute(f"CREATE TEMP TABLE incoming_deletes (LIKE {table}_tombstones) ON COMMIT DROP")
+                execute_values(cur, "INSERT INTO incoming_deletes (game_id, last_updated, origin_node) VALUES %s",
+                               batch['deletes'])
+                cur.execute(f"DELETE FROM {table} t USING incoming_deletes d WHERE t.game_id = d.game_id "
+                            f"AND (d.last_updated, d.origin_node) > (t.last_updated, COALESCE(t.origin_node, ''))")
+                stats['deletes_applied'] = cur.rowcount
+                cur.execute(f"INSERT INTO {table}_tombstones AS tb SELECT * FROM incoming_deletes "
+                            f"ON CONFLICT (game_id) DO UPDATE SET last_updated = EXCLUDED.last_updated, "
+                            f"origin_node = EXCLUDED.origin_node WHERE EXCLUDED.last_updated > tb.last_updated")
+        conn.commit()
+
+        # Drop cached reads on the target that could include the merged rows
+        if getattr(target, 'result_cache', None) is not None:
+            game_ids = {row[columns.index('game_id')] for row in batch['rows']}
+            game_ids.update(delete[0] for delete in batch['deletes'])
+            target.result_cache.invalidate(table, game_ids)
+        return stats
+
+    def resolve_conflicts(self, cur, target, columns: List[str], conflict_filter: str, conflict_args: tuple):
+        """
+        Replace conflicting incoming rows with the resolver's choice. The result is a new local version
+        on the target, so it wins the upsert here and is shipped to the other nodes in the next round.
+        """
+        column_list = ', '.join(f"t.{column}" for column in columns)
+        cur.execute(f"SELECT {column_list}, {', '.join(f'i.{column}' for column in columns)} "
+                    f"FROM incoming i JOIN {self.table_name} t USING (game_id) WHERE {conflict_filter}",
+                    conflict_args)
+        for row in cur.fetchall():
+            local_row = dict(zip(columns, row[:len(columns)]))
+            remote_row = dict(zip(columns, row[len(columns):]))
+            winner = dict(self.resolver(local_row, remote_row))
+            winner['last_updated'] = max(local_row['last_updated'], remote_row['last_updated']) + timedelta(microseconds=1)
+            winner['origin_node'] = target.id
+            assignments = ', '.join(f"{column} = %s" for column in columns if column != 'game_id')
+            cur.execute(f"UPDATE incoming SET {assignments} WHERE game_id = %s",
+                        [winner[column] for column in columns if column != 'game_id'] + [local_row['game_id']])
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'interval': self.interval,
+            'resolver': getattr(self.resolver, '__name__', 'last_write_wins') if self.resolver else 'last_write_wins',
+            'watermarks': {f'{source}->{target}': str(mark) for (source, target), mark in self.watermarks.items()},
+            **self.stats
+        }
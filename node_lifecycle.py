@@ -0,0 +1,123 @@
+import time
+import threading
+import logging
+from typing import List, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+class NodeLifecycle:
+    """
+    Owns startup and shutdown of the DatabaseNodes in a Flask app.
+
+    Nodes connect lazily; `start()` warms their connections up in parallel in the background, then
+    starts one periodic replication scheduler on the central node and any registered services.
+    `shutdown()` stops accepting transactions, drains in-flight transactions and replication, and
+    closes every connection.
+    """
+
+    def __init__(self, nodes: List, replication_interval: int = 60, drain_timeout: float = 30.0):
+        self.nodes = nodes
+        self.replication_interval = replication_interval
+        self.drain_timeout = drain_timeout
+        self.services = []  # objects with start()/stop() (or close()) managed together with the nodes
+        self.warmup_errors = {}
+        self.started_at = None
+        self.state = 'CREATED'
+        self.lock = threading.Lock()
+
+    def register(self, service):
+        self.services.append(service)
+
+    def start(self):
+        """
+        Begin warm-up without blocking the caller. Safe to call more than once.
+        """
+        with self.lock:
+            if self.state != 'CREATED':
+                return
+            self.state = 'WARMING_UP'
+            self.started_at = time.time()
+        threading.Thread(target=self.warm_up, daemon=True, name='lifecycle-warmup').start()
+
+    def warm_up(self):
+        def connect(node):
+            try:
+                node.ensure_connected()
+                self.warmup_errors.pop(node.id, None)
+            except Exception as e:
+                self.warmup_errors[node.id] = str(e)
+                logger.error(f"Warm-up connection to {node.id} failed: {e}")
+
+        threads = [threading.Thread(target=connect, args=(node,), daemon=True) for node in self.nodes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with self.lock:
+            if self.state != 'WARMING_UP':
+                return
+            for node in self.nodes:
+                if node.is_central:
+                    node.start_periodic_replication(self.replication_interval)
+            for service in self.services:
+                if hasattr(service, 'start'):
+                    service.start()
+            self.state = 'RUNNING'
+        logger.info(f"Warm-up finished in {time.time() - self.started_at:.2f}s")
+
+    def readiness(self) -> Dict[str, Any]:
+        nodes = {
+            node.id: {
+                'connected': node.conn is not None and not node.conn.closed,
+                'error': self.warmup_errors.get(node.id)
+            }
+            for node in self.nodes
+        }
+        return {
+            'ready': self.state == 'RUNNING' and all(node['connected'] for node in nodes.values()),
+            'state': self.state,
+            'nodes': nodes
+        }
+
+    def liveness(self) -> Dict[str, Any]:
+        return {
+            'alive': self.state != 'STOPPED',
+            'state': self.state,
+            'uptime': round(time.time() - self.started_at, 3) if self.started_at else 0,
+            'threads': threading.active_count(),
+            'replication_schedulers': sum(1 for node in self.nodes
+                                          if node.replication_thread and node.replication_thread.is_alive())
+        }
+
+    def shutdown(self):
+        """
+        Drain in-flight work and release every resource. Safe to call more than once.
+        """
+        with self.lock:
+            if self.state in ('STOPPING', 'STOPPED'):
+                return
+            self.state = 'STOPPING'
+        logger.info("Shutting down: draining in-flight transactions and replication")
+
+        deadline = time.time() + self.drain_timeout
+        for node in self.nodes:
+            if not node.drain(max(0.0, deadline - time.time())):
+                logger.warning(f"{node.id} still had {node.in_flight} transaction(s) in flight at shutdown")
+
+        for service in self.services:
+            try:
+                (getattr(service, 'stop', None) or service.close)()
+            except Exception as e:
+                logger.error(f"Failed to stop {type(service).__name__}: {e}")
+
+        for node in self.nodes:
+            node.stop_periodic_replication()
+            node.forwarder.shutdown(wait=True)
+            if node.conn is not None and not node.conn.closed:
+                node.conn.close()
+
+        with self.lock:
+            self.state = 'STOPPED'
+        logger.info("Shutdown complete")
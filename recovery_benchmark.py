@@ -0,0 +1,302 @@
+"""
+Crash/recovery benchmark for flask_simulation_w_crash.py.
+
+Runs a sustained write workload against the docker-compose nodes and crashes nodes at scripted points.
+Every crash marks the node as crashed in the app (simulate_crash) and, unless --no-docker is given,
+stops its container for the outage so the node really misses the writes made meanwhile.
+
+Per scenario the report records:
+    detect_seconds            crash -> failure detector suspects the node
+    reconnect_seconds         container back up -> node reconnected by automatic recovery
+    unavailable_seconds       crash -> node available again
+    write_unavailable_seconds longest gap between successful writes during the scenario
+    catch_up_seconds          reconnect -> node's table matches the central node again
+    replay_rows_per_second    rows that differed at reconnect / catch_up_seconds
+    divergence                rows missing, extra or different on each node after recovery
+
+Usage:
+    docker compose up -d
+    python3 recovery_benchmark.py --output recovery_report.json [--scenarios scenarios.json]
+
+A scenario file is a JSON list of {"node", "at", "outage", "backlog"}: crash `node` `at` seconds into
+the scenario, keep it down for `outage` seconds, and issue `backlog` extra writes while it is down.
+"""
+import os
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+import logging
+from typing import List, Dict, Any
+
+logger = logging.getLogger('recovery_benchmark')
+
+DEFAULT_SCENARIOS = [
+    {'node': 'Node-2', 'at': 5, 'outage': 5, 'backlog': 50},
+    {'node': 'Node-3', 'at': 5, 'outage': 15, 'backlog': 200},
+    {'node': 'Node-1', 'at': 5, 'outage': 10, 'backlog': 100},
+    {'node': 'Node-2', 'at': 5, 'outage': 30, 'backlog': 500}
+]
+
+COMPARED_COLUMNS = 'game_id, title, developer, publisher, price'
+
+
+class WriteWorkload:
+    """
+    Background writer that updates game prices on whichever node is currently central.
+
+    Writes are plain literal UPDATEs so they can be replayed on replicas as they are. The node's
+    transactions share its single connection, so writes from the background thread and the scenario's
+    backlog are serialized by `write_lock`.
+    """
+
+    def __init__(self, app, game_ids: List[int], rate: float):
+        self.app = app
+        self.game_ids = game_ids
+        self.rate = rate
+        self.ok = 0
+        self.failed = 0
+        self.success_times = []
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def write_once(self) -> bool:
+        node = self.app.failover.central
+        game_id = random.choice(self.game_ids)
+        price = round(random.uniform(0, 60), 2)
+        with self.write_lock:
+            try:
+                tx_id = node.begin_transaction('READ_COMMITTED')
+                node.execute_transaction(
+                    tx_id, f"UPDATE steam_games SET price = {price} WHERE game_id = {game_id} RETURNING game_id, price;")
+                committed = node.transactions.get(tx_id, {}).get('status') == 'COMMITTED'
+            except Exception:
+                committed = False
+
+        with self.lock:
+            if committed:
+                self.ok += 1
+                self.success_times.append(time.time())
+            else:
+                self.failed += 1
+        return committed
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.write_once()
+            self.stop_event.wait(1.0 / self.rate)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True, name='write-workload')
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def longest_gap(self, start: float, end: float) -> float:
+        with self.lock:
+            times = [start] + [t for t in self.success_times if start <= t <= end] + [end]
+        return max(later - earlier for earlier, later in zip(times, times[1:]))
+
+
+def read_table(topology, node_id: str) -> Dict[int, tuple]:
+    conn = topology.connect(node_id)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT {COMPARED_COLUMNS} FROM steam_games")
+            return {row[0]: row[1:] for row in cur.fetchall()}
+    finally:
+        conn.close()
+
+
+def compare_tables(reference: Dict[int, tuple], table: Dict[int, tuple]) -> Dict[str, int]:
+    missing = reference.keys() - table.keys()
+    extra = table.keys() - reference.keys()
+    different = sum(1 for game_id in reference.keys() & table.keys() if reference[game_id] != table[game_id])
+    return {'missing': len(missing), 'extra': len(extra), 'different': different,
+            'total': len(missing) + len(extra) + different}
+
+
+def divergence(app) -> Dict[str, Dict[str, int]]:
+    """
+    Compare every node's table with the current central node's.
+    """
+    central_id = app.failover.central.id
+    reference = read_table(app.TOPOLOGY, central_id)
+    result = {}
+    for node_id in app.nodes:
+        if node_id == central_id:
+            continue
+        try:
+            result[node_id] = compare_tables(reference, read_table(app.TOPOLOGY, node_id))
+        except Exception as e:
+            result[node_id] = {'error': str(e)}
+    return result
+
+
+def wait_until(condition, timeout: float, poll: float = 0.05):
+    """
+    Time at which `condition()` first held, or None on timeout.
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if condition():
+                return time.time()
+        except Exception:
+            pass
+        time.sleep(poll)
+    return None
+
+
+def docker(action: str, container: str):
+    subprocess.run(['docker', action, container], check=True, capture_output=True)
+
+
+def run_scenario(app, workload: WriteWorkload, scenario: Dict[str, Any], use_docker: bool,
+                 timeout: float) -> Dict[str, Any]:
+    node = app.nodes[scenario['node']]
+    container = app.TOPOLOGY.nodes[node.id].get('container')
+    was_central = node is app.failover.central
+    result = {**scenario, 'was_central': was_central, 'docker': use_docker and bool(container)}
+
+    time.sleep(scenario['at'])
+    scenario_start = time.time() - scenario['at']
+
+    # Crash
+    crashed_at = time.time()
+    node.simulate_crash()
+    if result['docker']:
+        docker('stop', container)
+
+    # Without docker the node may reconnect before it is ever suspected
+    detected_at = wait_until(lambda: node.id in app.failover.detector.suspected
+                             or (not result['docker'] and node.is_available), timeout)
+    if node.id not in app.failover.detector.suspected:
+        detected_at = None
+    result['detect_seconds'] = round(detected_at - crashed_at, 3) if detected_at else None
+    if was_central:
+        result['promoted'] = app.failover.central.id if app.failover.central is not node else None
+
+    # Backlog written while the node is down
+    backlog_ok = sum(1 for _ in range(scenario['backlog']) if workload.write_once())
+    result['backlog_written'] = backlog_ok
+    remaining = scenario['outage'] - (time.time() - crashed_at)
+    if remaining > 0:
+        time.sleep(remaining)
+
+    # Restore
+    restored_at = time.time()
+    if result['docker']:
+        docker('start', container)
+    reconnected_at = wait_until(lambda: node.is_available and node.conn is not None and not node.conn.closed,
+                                timeout)
+    result['reconnect_seconds'] = round(reconnected_at - restored_at, 3) if reconnected_at else None
+    result['unavailable_seconds'] = round((reconnected_at or time.time()) - crashed_at, 3)
+    if reconnected_at is None:
+        result['error'] = 'node did not reconnect'
+        return result
+
+    # Catch-up: the central node re-replicates to the rejoined node
+    def node_divergence():
+        return compare_tables(read_table(app.TOPOLOGY, app.failover.central.id),
+                              read_table(app.TOPOLOGY, node.id))['total']
+
+    try:
+        replay_rows = node_divergence() if node is not app.failover.central else 0
+    except Exception:
+        replay_rows = None
+    caught_up_at = wait_until(lambda: node is app.failover.central or node_divergence() == 0, timeout, poll=0.25)
+    result['replay_rows'] = replay_rows
+    result['catch_up_seconds'] = round(caught_up_at - reconnected_at, 3) if caught_up_at else None
+    if caught_up_at and replay_rows:
+        result['replay_rows_per_second'] = round(replay_rows / max(caught_up_at - reconnected_at, 1e-3), 1)
+    else:
+        result['replay_rows_per_second'] = None
+
+    result['write_unavailable_seconds'] = round(workload.longest_gap(scenario_start, time.time()), 3)
+    result['divergence'] = divergence(app)
+    return result
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def stats(name):
+        values = [result[name] for result in results if result.get(name) is not None]
+        if not values:
+            return None
+        return {'mean': round(sum(values) / len(values), 3), 'max': max(values)}
+
+    return {
+        'scenarios': len(results),
+        'failed_scenarios': sum(1 for result in results if 'error' in result),
+        'diverged_scenarios': sum(1 for result in results
+                                  if any(d.get('total', 1) for d in result.get('divergence', {}).values())),
+        **{name: stats(name) for name in ('detect_seconds', 'reconnect_seconds', 'unavailable_seconds',
+                                          'write_unavailable_seconds', 'catch_up_seconds',
+                                          'replay_rows_per_second')}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Crash/recovery benchmark for the three-node cluster')
+    parser.add_argument('--scenarios', help='JSON file with the crash scenarios (default: built-in list)')
+    parser.add_argument('--output', default='recovery_report.json', help='where to write the JSON report')
+    parser.add_argument('--rate', type=float, default=20.0, help='background writes per second')
+    parser.add_argument('--timeout', type=float, default=120.0, help='max seconds to wait for each phase')
+    parser.add_argument('--no-docker', action='store_true',
+                        help='only mark nodes crashed in the app; automatic recovery then reconnects at once, '
+                             'so outages are not held and the failure detector may not fire')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    scenarios = DEFAULT_SCENARIOS
+    if args.scenarios:
+        with open(args.scenarios, 'r') as file:
+            scenarios = json.load(file)
+
+    # Importing the app builds the nodes, the failover manager and the lifecycle; start them like the app's main does
+    import flask_simulation_w_crash as app
+    app.lifecycle.start()
+
+    if not wait_until(lambda: app.lifecycle.readiness()['ready'], args.timeout):
+        raise SystemExit(f"Nodes not ready: {app.lifecycle.readiness()}")
+
+    game_ids = list(read_table(app.TOPOLOGY, app.failover.central.id))
+    workload = WriteWorkload(app, game_ids, args.rate)
+    report = {
+        'started_at': time.time(),
+        'config': {'rate': args.rate, 'timeout': args.timeout, 'docker': not args.no_docker,
+                   'rows': len(game_ids), 'topology': app.TOPOLOGY.node_ids()},
+        'scenarios': []
+    }
+
+    workload.start()
+    try:
+        for scenario in scenarios:
+            logger.info(f"Scenario: crash {scenario['node']} for {scenario['outage']}s "
+                        f"with a backlog of {scenario['backlog']} writes")
+            result = run_scenario(app, workload, scenario, not args.no_docker, args.timeout)
+            report['scenarios'].append(result)
+            logger.info(f"Result: {json.dumps(result)}")
+
+            # Let heartbeats settle before the next crash
+            wait_until(lambda: not app.failover.detector.suspected, args.timeout)
+    finally:
+        workload.stop()
+        report['finished_at'] = time.time()
+        report['workload'] = {'writes_ok': workload.ok, 'writes_failed': workload.failed}
+        report['summary'] = summarize(report['scenarios'])
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        logger.info(f"Report written to {os.path.abspath(args.output)}")
+        app.lifecycle.shutdown()
+
+
+if __name__ == '__main__':
+    main()
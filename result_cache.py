@@ -0,0 +1,140 @@
+import re
+import sys
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Set, Tuple
+
+TABLE_PATTERN = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+([A-Za-z_][\w.]*)', re.IGNORECASE)
+NEGATION_PATTERN = re.compile(r'\bNOT\b|<>|!=', re.IGNORECASE)
+GAME_ID_EQUALS = re.compile(r'\bgame_id\s*=\s*(\d+)', re.IGNORECASE)
+GAME_ID_IN = re.compile(r'\bgame_id\s+IN\s*\(\s*(\d+(?:\s*,\s*\d+)*)\s*\)', re.IGNORECASE)
+
+
+def tables_in(query: str) -> Set[str]:
+    # Schema-qualified names (public.steam_games) count as the bare table name
+    return {table.split('.')[-1].lower() for table in TABLE_PATTERN.findall(query)}
+
+
+def game_ids_in(query: str) -> Optional[Set[int]]:
+    """
+    The game_ids a statement is restricted to by a `game_id = N` or `game_id IN (...)` predicate,
+    or None if it can touch any row. ORs, negations (NOT, <>, !=) and subqueries are treated as
+    touching any row.
+    """
+    upper = query.upper()
+    if ' OR ' in upper or upper.count('SELECT') > 1 or 'WHERE' not in upper or NEGATION_PATTERN.search(query):
+        return None
+    ids = {int(value) for value in GAME_ID_EQUALS.findall(query)}
+    for values in GAME_ID_IN.findall(query):
+        ids.update(int(value) for value in values.split(','))
+    return ids or None
+
+
+class ResultCache:
+    """
+    LRU cache of read-only transaction results on a DatabaseNode, bounded by `max_bytes`.
+
+    Entries are keyed by query text, parameters and isolation level. Every entry records the tables it
+    read and, for lookups restricted by game_id, the game_ids it depends on. Whatever changes the node's
+    data (replication, merge rounds, local writes, recovery) calls `invalidate()` with the table and, if
+    known, the changed game_ids; entries that could be affected are dropped.
+    """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> entry dict, least recently used first
+        self.size = 0
+        self.generation = 0  # bumped on every invalidation
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'invalidations': 0,
+                      'saved_seconds': 0.0}
+
+    @staticmethod
+    def cacheable(query: str) -> bool:
+        statement = query.strip().upper()
+        return statement.startswith('SELECT') and 'FOR UPDATE' not in statement and 'FOR SHARE' not in statement
+
+    @staticmethod
+    def make_key(query: str, params, isolation_level: str) -> Tuple:
+        return (' '.join(query.split()), repr(tuple(params or ())), isolation_level)
+
+    def get(self, key: Tuple) -> Optional[str]:
+        started = time.perf_counter()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            self.stats['saved_seconds'] += max(0.0, entry['cost'] - (time.perf_counter() - started))
+            return entry['output']
+
+    def put(self, key: Tuple, query: str, output: str, cost: float, generation: int):
+        """
+        Store a result computed in `cost` seconds. `generation` is the value read before the query ran;
+        if an invalidation happened since, the result may predate it and is not stored.
+        """
+        size = sys.getsizeof(output) + sys.getsizeof(key[0])
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if generation != self.generation:
+                return
+            if key in self.entries:
+                self.drop(key)
+            self.entries[key] = {
+                'output': output,
+                'size': size,
+                'cost': cost,
+                'tables': tables_in(query),
+                'game_ids': game_ids_in(query)
+            }
+            self.size += size
+            self.stats['stores'] += 1
+            while self.size > self.max_bytes:
+                self.drop(next(iter(self.entries)))
+                self.stats['evictions'] += 1
+
+    def drop(self, key: Tuple):
+        self.size -= self.entries.pop(key)['size']
+
+    def invalidate(self, table: str = None, game_ids: Set[int] = None):
+        """
+        Drop entries that could be affected by a change to `table` (every table if None). With `game_ids`,
+        entries restricted to other game_ids are kept.
+        """
+        table = table.split('.')[-1].lower() if table else None
+        with self.lock:
+            self.generation += 1
+            stale = [
+                key for key, entry in self.entries.items()
+                if (table is None or table in entry['tables'])
+                and (not game_ids or entry['game_ids'] is None or entry['game_ids'] & set(game_ids))
+            ]
+            for key in stale:
+                self.drop(key)
+            self.stats['invalidations'] += len(stale)
+
+    def invalidate_for_write(self, query: str):
+        """
+        Invalidate what a write statement executed on this node could have changed.
+        """
+        tables = tables_in(query)
+        if not tables:
+            self.invalidate()
+        for table in tables:
+            self.invalidate(table, game_ids_in(query))
+
+    def status(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'saved_seconds': round(self.stats['saved_seconds'], 4),
+                'hit_ratio': round(self.stats['hits'] / lookups, 4) if lookups else 0.0,
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,88 @@
+import os
+import json
+import psycopg2
+from typing import List, Dict, Any
+
+DEFAULT_TOPOLOGY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'topology.json')
+
+
+class Topology:
+    """
+    Cluster layout loaded from a JSON config (see topology.json).
+
+    Every node has an `id`, a `role` ('central' or 'replica'), connection settings (either a `dsn` string
+    or host/port/database/user/password), and a `parent`: the node it receives replication from.
+    Replicas whose parent is another replica receive the change stream by cascading replication.
+    An optional `container` names the node's docker-compose container (used by recovery_benchmark.py).
+
+    `replication_mode` is 'primary' (the central node pushes its table to the replicas) or 'merge'
+    (every node accepts writes and changes are merged between all nodes, see merge_replication.py).
+    """
+
+    def __init__(self, nodes: List[Dict[str, Any]], replication_mode: str = 'primary'):
+        self.nodes = {node['id']: node for node in nodes}
+        self.replication_mode = replication_mode
+        self.validate()
+
+    @classmethod
+    def load(cls, path: str = None) -> 'Topology':
+        path = path or os.environ.get('TOPOLOGY_FILE', DEFAULT_TOPOLOGY_FILE)
+        with open(path, 'r') as file:
+            config = json.load(file)
+        return cls(config['nodes'], config.get('replication_mode', 'primary'))
+
+    def validate(self):
+        if self.replication_mode not in ('primary', 'merge'):
+            raise ValueError(f'Unknown replication mode: {self.replication_mode}')
+
+        centrals = [node_id for node_id, node in self.nodes.items() if node['role'] == 'central']
+        if len(centrals) != 1:
+            raise ValueError(f'Topology must have exactly one central node, found {len(centrals)}')
+
+        for node_id, node in self.nodes.items():
+            if node['role'] == 'central':
+                continue
+            if node.get('parent') not in self.nodes:
+                raise ValueError(f"Replica {node_id} has an unknown parent: {node.get('parent')}")
+
+            # Every replica must reach the central node by following parents
+            seen = {node_id}
+            parent = node['parent']
+            while self.nodes[parent]['role'] != 'central':
+                if parent in seen:
+                    raise ValueError(f'Replication cycle through {node_id}')
+                seen.add(parent)
+                parent = self.nodes[parent]['parent']
+
+    @property
+    def central_id(self) -> str:
+        return next(node_id for node_id, node in self.nodes.items() if node['role'] == 'central')
+
+    def node_ids(self) -> List[str]:
+        return list(self.nodes)
+
+    def replica_ids(self) -> List[str]:
+        return [node_id for node_id, node in self.nodes.items() if node['role'] != 'central']
+
+    def is_central(self, node_id: str) -> bool:
+        return self.nodes[node_id]['role'] == 'central'
+
+    def children(self, node_id: str) -> List[str]:
+        """
+        Direct replication targets of a node.
+        """
+        return [child_id for child_id, node in self.nodes.items() if node.get('parent') == node_id]
+
+    def connect(self, node_id: str):
+        if node_id not in self.nodes:
+            raise ValueError(f'Invalid node ID: {node_id}')
+
+        # Bounded connect so an unreachable node cannot hang startup or failover
+        node = self.nodes[node_id]
+        connect_timeout = node.get('connect_timeout', 5)
+        if node.get('dsn'):
+            return psycopg2.connect(node['dsn'], connect_timeout=connect_timeout)
+        return psycopg2.connect(
+            host=node['host'], port=node['port'], database=node['database'],
+            user=node['user'], password=node['password'], connect_timeout=connect_timeout
+        )